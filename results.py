@@ -1177,3 +1177,18 @@ print("Average Temperature:")
 print(errors.extrapolate(temp1, temp2))
 print("Uncertainty:")
 print(temp2 - temp1)
+
+# %% Parameter sweeps: number of fins, fin height and fin separation solved
+# concurrently over a process pool
+import src.sweep as sweep
+
+grid = sweep.parameter_grid(
+    base_width=[16e-3, 28e-3, 40e-3, 52e-3],
+    fin_height=[5e-3, 15e-3, 30e-3, 45e-3, 60e-3],
+    fin_width=1e-3,
+    fin_spacing=[1e-3, 2e-3, 3e-3],
+)
+rows = sweep.run_sweep(
+    grid, 0.001, stopping_condition=1e-7, max_iterations=1000000, method="newton"
+)
+print(sweep.format_table(rows))
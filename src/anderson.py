@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class AndersonMixing:
+    def __init__(self, depth, restart_growth=10.0):
+        """
+        Anderson acceleration of a fixed-point iteration x -> g(x), treating g as a
+        black box. Keeps the differences of the last depth iterates and residuals
+        f = g(x) - x and mixes them to minimise the linearised residual. The history
+        is cleared (restarted) when the residual grows by more than restart_growth
+        relative to the smallest residual since the last restart.
+        """
+        self.depth = depth
+        self.restart_growth = restart_growth
+        self.restart()
+
+    def restart(self):
+        """
+        Clears the history.
+        """
+        self.residual_diffs = []
+        self.update_diffs = []
+        self.previous = None
+        self.smallest_norm = np.inf
+
+    def mix(self, x: np.ndarray, g_x: np.ndarray) -> np.ndarray:
+        """
+        Given the current iterate x and its image g(x), returns the next iterate.
+        """
+        residual = (g_x - x).ravel()
+        norm = np.linalg.norm(residual)
+
+        # Safeguarding: plain fixed-point steps while the residual is growing
+        if not np.isfinite(norm) or norm > self.restart_growth * self.smallest_norm:
+            self.restart()
+            return g_x
+        self.smallest_norm = min(self.smallest_norm, norm)
+
+        if self.previous is not None:
+            previous_residual, previous_update = self.previous
+            self.residual_diffs.append(residual - previous_residual)
+            self.update_diffs.append(g_x.ravel() - previous_update)
+            if len(self.residual_diffs) > self.depth:
+                self.residual_diffs.pop(0)
+                self.update_diffs.pop(0)
+        self.previous = (residual, g_x.ravel().copy())
+
+        if not self.residual_diffs:
+            return g_x
+
+        # Least-squares mixing coefficients
+        residual_diffs = np.stack(self.residual_diffs, axis=1)
+        update_diffs = np.stack(self.update_diffs, axis=1)
+        gamma = np.linalg.lstsq(residual_diffs, residual, rcond=None)[0]
+        mixed = g_x.ravel() - update_diffs @ gamma
+
+        if not np.all(np.isfinite(mixed)):
+            self.restart()
+            return g_x
+
+        return mixed.reshape(g_x.shape)
@@ -0,0 +1,182 @@
+import hashlib
+import numpy as np
+import scipy.sparse as sparse
+import scipy.sparse.linalg as splinalg
+from collections import OrderedDict
+from typing import Callable
+from .jacobi import OPERATION_WEIGHTS, neighbour_indices
+
+# Number of sparse LU factorisations kept by linear_factorisation
+FACTORISATION_CACHE_SIZE = 16
+_factorisations = OrderedDict()
+
+
+class SparseSystem:
+    def __init__(
+        self,
+        op_mask: np.ndarray,
+        pow_mask: np.ndarray,
+        k_mask: np.ndarray,
+        step_size,
+        fixed_temps: np.ndarray = None,
+    ):
+        """
+        Assembles the discrete equations implied by the operations (the fixed points
+        of jacobi_poisson_iteration) for the solid points into
+
+        matrix @ T + flux * boundary(T) = rhs
+
+        where matrix is a sparse CSR matrix and flux is only non-zero on the
+        boundaries. Air points are not unknowns. Air neighbours with a weight (e.g.
+        beside fins one point wide) are known values, their temperatures in
+        fixed_temps, and are part of rhs (see power_rhs).
+        """
+        self.shape = op_mask.shape
+        ops = op_mask.ravel().astype(int)
+        k = k_mask.ravel()
+        k_btm = np.roll(k_mask, 1, axis=1).ravel()
+        k_top = np.roll(k_mask, -1, axis=1).ravel()
+        neighbours = neighbour_indices(self.shape)
+
+        # Flat indices of the solid points and their position in the unknowns
+        self.cells = np.flatnonzero(ops != 0)
+        position = np.full(ops.size, -1)
+        position[self.cells] = np.arange(self.cells.size)
+        cell_ops = ops[self.cells]
+        cell_k = k[self.cells]
+
+        # Neighbour weights and flux multipliers of each operation
+        table = np.zeros((max(OPERATION_WEIGHTS) + 1, 5))
+        for op, weights in OPERATION_WEIGHTS.items():
+            table[op] = weights
+        weights = table[cell_ops]
+        diagonal = np.full(self.cells.size, 4.0)
+
+        # Material interfaces
+        interface = cell_ops == 10
+        weights[interface, 2] = k_btm[self.cells[interface]]
+        weights[interface, 3] = k_top[self.cells[interface]]
+        diagonal[interface] = weights[interface, 2] + weights[interface, 3]
+
+        self.flux = weights[:, 4] * step_size / cell_k
+        self.source_scale = np.where(interface, 0, step_size**2 / cell_k)
+
+        rows = [np.arange(self.cells.size)]
+        cols = [np.arange(self.cells.size)]
+        data = [diagonal]
+        air_rows, air_neighbours, air_weights = [], [], []
+        for direction in range(4):
+            neighbour = neighbours[direction][self.cells]
+            coupled = weights[:, direction] != 0
+            air = coupled & (ops[neighbour] == 0)
+            coupled &= ~air
+            rows.append(np.flatnonzero(coupled))
+            cols.append(position[neighbour[coupled]])
+            data.append(-weights[coupled, direction])
+            air_rows.append(np.flatnonzero(air))
+            air_neighbours.append(neighbour[air])
+            air_weights.append(weights[air, direction])
+
+        # Couplings to air neighbours, as rows, flat grid indices and weights
+        self.air_terms = (
+            np.concatenate(air_rows),
+            np.concatenate(air_neighbours),
+            np.concatenate(air_weights),
+        )
+        self.rhs = self.power_rhs(pow_mask, fixed_temps)
+
+        self.matrix = sparse.csr_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(self.cells.size, self.cells.size),
+        )
+
+    def power_rhs(
+        self, pow_mask: np.ndarray, fixed_temps: np.ndarray = None
+    ) -> np.ndarray:
+        """
+        Right-hand side of the equations for a mask of power outputs and a grid of the
+        fixed temperatures of air points, which is only required if some solid point
+        has an air neighbour with a weight.
+        """
+        rhs = self.source_scale * pow_mask.ravel()[self.cells]
+
+        rows, air_neighbours, air_weights = self.air_terms
+        if rows.size:
+            if fixed_temps is None:
+                raise RuntimeError(
+                    "Solid points next to air, e.g. beside fins one point wide, "
+                    "require the fixed air temperatures"
+                )
+            np.add.at(rhs, rows, air_weights * fixed_temps.ravel()[air_neighbours])
+
+        return rhs
+
+    def residual(self, temps: np.ndarray, boundary: Callable) -> np.ndarray:
+        """
+        Residual of the equations for a vector of solid point temperatures.
+        """
+        return self.matrix @ temps + self.flux * boundary(temps) - self.rhs
+
+    def jacobian(self, temps: np.ndarray, derivative: Callable):
+        """
+        Jacobian of the residual for a vector of solid point temperatures, given the
+        derivative of the boundary heat flux.
+        """
+        return self.matrix + sparse.diags(self.flux * derivative(temps))
+
+    def gather(self, grid: np.ndarray) -> np.ndarray:
+        """
+        Vector of the solid point values of a grid.
+        """
+        return grid.ravel()[self.cells]
+
+    def scatter(self, values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+        """
+        Writes a vector of solid point values into a copy of the grid.
+        """
+        grid = grid.copy()
+        grid.ravel()[self.cells] = values
+
+        return grid
+
+
+def linear_factorisation(
+    op_mask: np.ndarray,
+    pow_mask: np.ndarray,
+    k_mask: np.ndarray,
+    step_size,
+    slope,
+    fixed_temps: np.ndarray = None,
+) -> tuple:
+    """
+    Returns the SparseSystem and the sparse LU factorisation of
+
+    matrix + slope * diag(flux)
+
+    which are the equations for a linear boundary heat flux with the given slope
+    (W/m^2K). The factorisations of the last FACTORISATION_CACHE_SIZE geometries
+    are cached, keyed by the operation and conductivity masks, the step size and
+    the slope, so that only the right-hand side has to be recalculated for a
+    different power output or ambient temperature. fixed_temps is passed on to
+    SparseSystem.
+    """
+    key = hashlib.sha1()
+    for array in (op_mask, k_mask):
+        key.update(str(array.shape).encode())
+        key.update(np.ascontiguousarray(array, dtype=float).tobytes())
+    key.update(repr((float(step_size), float(slope))).encode())
+    key = key.hexdigest()
+
+    if key in _factorisations:
+        _factorisations.move_to_end(key)
+        return _factorisations[key]
+
+    system = SparseSystem(op_mask, pow_mask, k_mask, step_size, fixed_temps)
+    matrix = system.matrix + sparse.diags(slope * system.flux)
+    factorisation = (system, splinalg.splu(matrix.tocsc()))
+
+    _factorisations[key] = factorisation
+    if len(_factorisations) > FACTORISATION_CACHE_SIZE:
+        _factorisations.popitem(last=False)
+
+    return factorisation
@@ -0,0 +1,107 @@
+import numpy as np
+from typing import Callable
+
+# Area of the points of each operation in the discrete equations, in units of the
+# square of the step size. Material interfaces (10) cover no area.
+CELL_AREAS = {
+    1: 1,
+    2: 1 / 2,
+    3: 1 / 2,
+    4: 1 / 2,
+    5: 1 / 2,
+    6: 1 / 4,
+    7: 1 / 4,
+    8: 1 / 4,
+    9: 1 / 4,
+    11: 1 / 2,
+    12: 1 / 4,
+    13: 1 / 4,
+}
+
+# Length of surface exposed to the air by the points of each boundary operation, in
+# units of the step size. The boundary points on a symmetry line (12 and 13) only
+# expose the half in the solved domain.
+EXPOSED_LENGTHS = {
+    2: 1,
+    3: 1,
+    4: 1,
+    5: 1,
+    6: 1,
+    7: 1,
+    8: 1,
+    9: 1,
+    12: 1 / 2,
+    13: 1 / 2,
+}
+
+# Maximum number of Newton iterations of EnergyBalance.balancing_shift
+MAX_SHIFT_ITERATIONS = 50
+
+
+def cell_areas(op_mask: np.ndarray, step_size) -> np.ndarray:
+    """
+    Mask of the area (m^2 per unit depth) of each point in the discrete equations.
+    """
+    areas = np.zeros(op_mask.shape)
+    for op, area in CELL_AREAS.items():
+        areas[op_mask == op] = area * step_size**2
+
+    return areas
+
+
+def exposed_lengths(op_mask: np.ndarray, step_size) -> np.ndarray:
+    """
+    Mask of the length of surface (m per unit depth) each point exposes to the air.
+    """
+    lengths = np.zeros(op_mask.shape)
+    for op, length in EXPOSED_LENGTHS.items():
+        lengths[op_mask == op] = length * step_size
+
+    return lengths
+
+
+class EnergyBalance:
+    def __init__(self, op_mask: np.ndarray, step_size, heat_generated):
+        """
+        Compares the heat dissipated through the boundary points of a grid with the
+        heat generated (W per unit depth). The boundary points and their exposed
+        lengths are precompiled so that a check only evaluates the boundary heat
+        flux at those points.
+        """
+        lengths = exposed_lengths(op_mask, step_size).ravel()
+        self.cells = np.flatnonzero(lengths)
+        self.lengths = lengths[self.cells]
+        self.heat_generated = heat_generated
+
+    def dissipated(self, temps: np.ndarray, boundary: Callable) -> float:
+        """
+        Heat leaving the boundary points (W per unit depth).
+        """
+        return np.dot(self.lengths, boundary(temps.ravel()[self.cells]))
+
+    def imbalance(self, temps: np.ndarray, boundary: Callable) -> float:
+        """
+        Heat generated less the heat dissipated, relative to the heat generated.
+        """
+        dissipated = self.dissipated(temps, boundary)
+        return (self.heat_generated - dissipated) / self.heat_generated
+
+    def balancing_shift(
+        self, temps: np.ndarray, boundary: Callable, derivative: Callable
+    ) -> float:
+        """
+        Uniform temperature shift after which the boundary points of temps dissipate
+        the heat generated, found with Newton's method (derivative is that of the
+        boundary heat flux).
+        """
+        surface = temps.ravel()[self.cells]
+        shift = 0.0
+        for _ in range(MAX_SHIFT_ITERATIONS):
+            dissipated = np.dot(self.lengths, boundary(surface + shift))
+            slope = np.dot(self.lengths, derivative(surface + shift))
+            step = (self.heat_generated - dissipated) / slope
+            shift += step
+            if abs(step) <= 1e-12 * np.max(np.abs(surface)):
+                break
+
+        return shift
@@ -5,29 +5,99 @@ from uncertainties import ufloat
 def mean_value(grid: np.ndarray, convergence_errors: np.ndarray):
     """
     Determines the mean value of the grid and determines the associated convergence
-    uncertainty.
+    uncertainty, treating the convergence errors of the grid values as independent.
     """
+    mean = np.mean(grid)
+    uncertainty = np.sqrt(np.sum(np.square(convergence_errors))) / np.size(grid)
 
-    # Combining grid values with errors
-    values = []
-    for i in range(len(grid)):
-        for j in range(len(grid[0])):
-            val = grid[i][j]
-            error = convergence_errors[i][j]
-            values.append(ufloat(val, error))
+    return ufloat(mean, uncertainty)
 
-    # Determining the mean (with uncertainty)
-    sum = 0
-    for elem in values:
-        sum += elem
 
-    return sum / len(values)
-
-
-def extrapolate(val, half_val):
+def extrapolate(val, half_val, order=2):
     """
     Use Richardson extrapolation to determine an estimate for the exact value. val
     and half_val are solutions at an arbitrary step size and half that step size
-    respectively.
+    respectively, and order is the order of convergence of the discretisation.
+    """
+    factor = 2**order
+    return (factor * half_val - val) / (factor - 1)
+
+
+def observed_order(val, half_val, quarter_val):
+    """
+    Determines the observed order of convergence from solutions at an arbitrary
+    step size, half and a quarter of that step size. Returns nan if the solutions
+    do not converge monotonically.
+    """
+    ratio = (val - half_val) / (half_val - quarter_val)
+    if not ratio > 0:
+        return np.nan
+
+    return float(np.log2(ratio))
+
+
+def richardson(values) -> tuple:
+    """
+    Richardson study of solutions (ufloats) at an arbitrary step size and
+    successively halved step sizes. Returns:
+    - the extrapolation of the last two solutions
+    - the observed order of convergence of the last three solutions (nan for two
+      solutions or non-monotone convergence, in which case second order is assumed)
+    - an estimate of the discretisation error of the extrapolated value, its
+      distance from the last solution
+    """
+    order = np.nan
+    if len(values) > 2:
+        order = observed_order(*(value.n for value in values[-3:]))
+    if np.isnan(order):
+        extrapolated = extrapolate(values[-2], values[-1])
+    else:
+        extrapolated = extrapolate(values[-2], values[-1], order)
+
+    return extrapolated, order, abs(extrapolated.n - values[-1].n)
+
+
+def aitken(first, second, third):
+    """
+    Aitken's delta-squared extrapolation of three equally spaced iterates of a
+    geometrically converging sequence. Returns None if they do not contract
+    monotonically.
+    """
+    ratio = (third - second) / (second - first)
+    if not 0 < ratio < 1:
+        return None
+
+    return third + (third - second) * ratio / (1 - ratio)
+
+
+def asymptotic_value(values, spacing=5):
+    """
+    Estimates the limit of a sequence of equally spaced iterates from Aitken
+    extrapolations of each three consecutive values. Slower modes make these
+    extrapolations drift geometrically as well, so the uncertainty is the remaining
+    drift extrapolated from the last three extrapolations that are spacing apart.
+    If the drift does not contract, the uncertainty is the distance between the
+    extrapolation and the last value, and if the values themselves do not contract
+    the last value is returned with an infinite uncertainty.
     """
-    return (4 * half_val - val) / 3
+    if not values:
+        raise RuntimeError("There are no iterates to extrapolate")
+    if len(values) < 3:
+        return ufloat(values[-1], np.inf)
+
+    limit = aitken(*values[-3:])
+    if limit is None:
+        return ufloat(values[-1], np.inf)
+
+    # Remaining drift of the extrapolations
+    if len(values) >= 2 * spacing + 3:
+        limits = [
+            aitken(*values[end - 3 : end])
+            for end in (len(values) - 2 * spacing, len(values) - spacing)
+        ]
+        if None not in limits:
+            drift = aitken(*limits, limit)
+            if drift is not None:
+                return ufloat(limit, abs(drift - limit))
+
+    return ufloat(limit, abs(limit - values[-1]))
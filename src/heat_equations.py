@@ -12,3 +12,44 @@ def forced_dissipation(surface_temp):
     celcius.
     """
     return 125.4 * (surface_temp - 20)
+
+
+def natural_dissipation_derivative(surface_temp):
+    """
+    Derivative of natural_dissipation with respect to the surface temperature.
+    """
+    return 1.31 * (4 / 3) * (surface_temp - 20) ** (1 / 3)
+
+
+def forced_dissipation_derivative(surface_temp):
+    """
+    Derivative of forced_dissipation with respect to the surface temperature.
+    """
+    return 125.4 + 0 * surface_temp
+
+
+def natural_dissipation_inverse(heat_flux):
+    """
+    Surface temperature at which natural convection removes the given heat flux.
+    """
+    return 20 + (heat_flux / 1.31) ** (3 / 4)
+
+
+def forced_dissipation_inverse(heat_flux):
+    """
+    Surface temperature at which forced convection removes the given heat flux.
+    """
+    return 20 + heat_flux / 125.4
+
+
+# Analytic derivatives of the boundary heat fluxes
+DERIVATIVES = {
+    natural_dissipation: natural_dissipation_derivative,
+    forced_dissipation: forced_dissipation_derivative,
+}
+
+# Analytic inverses of the boundary heat fluxes
+INVERSES = {
+    natural_dissipation: natural_dissipation_inverse,
+    forced_dissipation: forced_dissipation_inverse,
+}
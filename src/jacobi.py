@@ -1,4 +1,9 @@
+import multiprocessing
+import os
+import threading
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
 from typing import Callable
 
 
@@ -223,124 +228,1068 @@ def jacobi_poisson_iteration(
     """
     Given the old iteration of the solution, finds the next solution with constant
     Neumann boundary conditions applied (heat flux as a result of contact with
-    air).
+    air). The grids are the last two axes, so that a stack of grids of shape
+    (batch, nx, ny) is iterated at once.
     """
     # Shifted temperature values left, right, bottom and top
-    t_left = np.roll(old, 1, axis=0)
-    t_right = np.roll(old, -1, axis=0)
-    t_btm = np.roll(old, 1, axis=1)
-    t_top = np.roll(old, -1, axis=1)
+    t_left = np.roll(old, 1, axis=-2)
+    t_right = np.roll(old, -1, axis=-2)
+    t_btm = np.roll(old, 1, axis=-1)
+    t_top = np.roll(old, -1, axis=-1)
+
+    # Evaluating the mask of each operation once
+    cells = {op: op_mask == op for op in range(1, 11)}
 
     new = old.copy()
     # Interior point
-    new[op_mask == 1] = next_interior(
-        t_left[op_mask == 1],
-        t_right[op_mask == 1],
-        t_btm[op_mask == 1],
-        t_top[op_mask == 1],
-        k_centre[op_mask == 1],
-        pow_mask[op_mask == 1],
+    new[cells[1]] = next_interior(
+        t_left[cells[1]],
+        t_right[cells[1]],
+        t_btm[cells[1]],
+        t_top[cells[1]],
+        k_centre[cells[1]],
+        pow_mask[cells[1]],
         step_size,
     )
 
     # Left boundary
-    new[op_mask == 2] = next_left(
-        old[op_mask == 2],
-        t_right[op_mask == 2],
-        t_btm[op_mask == 2],
-        t_top[op_mask == 2],
-        k_centre[op_mask == 2],
-        pow_mask[op_mask == 2],
+    new[cells[2]] = next_left(
+        old[cells[2]],
+        t_right[cells[2]],
+        t_btm[cells[2]],
+        t_top[cells[2]],
+        k_centre[cells[2]],
+        pow_mask[cells[2]],
         boundary,
         step_size,
     )
 
     # Right boundary
-    new[op_mask == 3] = next_right(
-        old[op_mask == 3],
-        t_left[op_mask == 3],
-        t_btm[op_mask == 3],
-        t_top[op_mask == 3],
-        k_centre[op_mask == 3],
-        pow_mask[op_mask == 3],
+    new[cells[3]] = next_right(
+        old[cells[3]],
+        t_left[cells[3]],
+        t_btm[cells[3]],
+        t_top[cells[3]],
+        k_centre[cells[3]],
+        pow_mask[cells[3]],
         boundary,
         step_size,
     )
 
     # Bottom boundary
-    new[op_mask == 4] = next_btm(
-        old[op_mask == 4],
-        t_left[op_mask == 4],
-        t_right[op_mask == 4],
-        t_top[op_mask == 4],
-        k_centre[op_mask == 4],
-        pow_mask[op_mask == 4],
+    new[cells[4]] = next_btm(
+        old[cells[4]],
+        t_left[cells[4]],
+        t_right[cells[4]],
+        t_top[cells[4]],
+        k_centre[cells[4]],
+        pow_mask[cells[4]],
         boundary,
         step_size,
     )
 
     # Top boundary
-    new[op_mask == 5] = next_top(
-        old[op_mask == 5],
-        t_left[op_mask == 5],
-        t_right[op_mask == 5],
-        t_btm[op_mask == 5],
-        k_centre[op_mask == 5],
-        pow_mask[op_mask == 5],
+    new[cells[5]] = next_top(
+        old[cells[5]],
+        t_left[cells[5]],
+        t_right[cells[5]],
+        t_btm[cells[5]],
+        k_centre[cells[5]],
+        pow_mask[cells[5]],
         boundary,
         step_size,
     )
 
     # Bottom-left corner
-    new[op_mask == 6] = next_btm_left(
-        old[op_mask == 6],
-        t_right[op_mask == 6],
-        t_top[op_mask == 6],
-        k_centre[op_mask == 6],
-        pow_mask[op_mask == 6],
+    new[cells[6]] = next_btm_left(
+        old[cells[6]],
+        t_right[cells[6]],
+        t_top[cells[6]],
+        k_centre[cells[6]],
+        pow_mask[cells[6]],
         boundary,
         step_size,
     )
 
     # Bottom-right corner
-    new[op_mask == 7] = next_btm_right(
-        old[op_mask == 7],
-        t_left[op_mask == 7],
-        t_top[op_mask == 7],
-        k_centre[op_mask == 7],
-        pow_mask[op_mask == 7],
+    new[cells[7]] = next_btm_right(
+        old[cells[7]],
+        t_left[cells[7]],
+        t_top[cells[7]],
+        k_centre[cells[7]],
+        pow_mask[cells[7]],
         boundary,
         step_size,
     )
 
     # Top-left corner
-    new[op_mask == 8] = next_top_left(
-        old[op_mask == 8],
-        t_right[op_mask == 8],
-        t_btm[op_mask == 8],
-        k_centre[op_mask == 8],
-        pow_mask[op_mask == 8],
+    new[cells[8]] = next_top_left(
+        old[cells[8]],
+        t_right[cells[8]],
+        t_btm[cells[8]],
+        k_centre[cells[8]],
+        pow_mask[cells[8]],
         boundary,
         step_size,
     )
 
     # Top-right corner
-    new[op_mask == 9] = next_top_right(
-        old[op_mask == 9],
-        t_left[op_mask == 9],
-        t_btm[op_mask == 9],
-        k_centre[op_mask == 9],
-        pow_mask[op_mask == 9],
+    new[cells[9]] = next_top_right(
+        old[cells[9]],
+        t_left[cells[9]],
+        t_btm[cells[9]],
+        k_centre[cells[9]],
+        pow_mask[cells[9]],
         boundary,
         step_size,
     )
 
     # Material interface
-    new[op_mask == 10] = next_interface(
-        t_btm[op_mask == 10],
-        t_top[op_mask == 10],
-        k_btm[op_mask == 10],
-        k_top[op_mask == 10],
+    new[cells[10]] = next_interface(
+        t_btm[cells[10]],
+        t_top[cells[10]],
+        k_btm[cells[10]],
+        k_top[cells[10]],
     )
 
     return new
+
+
+# Neighbour weights (left, right, bottom, top) and boundary flux multiplier of the
+# operations 1 to 9, and of the operations 11 to 13 of the points on a mirror
+# symmetry line at the right edge of a half domain, whose right neighbour is the
+# reflection of their left neighbour:
+# 11: Interior point on the symmetry line
+# 12: Bottom boundary on the symmetry line
+# 13: Top boundary on the symmetry line
+OPERATION_WEIGHTS = {
+    1: (1, 1, 1, 1, 0),
+    2: (0, 2, 1, 1, 2),
+    3: (2, 0, 1, 1, 2),
+    4: (1, 1, 0, 2, 2),
+    5: (1, 1, 2, 0, 2),
+    6: (0, 2, 0, 2, 4),
+    7: (2, 0, 0, 2, 4),
+    8: (0, 2, 2, 0, 4),
+    9: (2, 0, 2, 0, 4),
+    11: (2, 0, 1, 1, 0),
+    12: (2, 0, 0, 2, 2),
+    13: (2, 0, 2, 0, 2),
+}
+
+
+def neighbour_indices(shape: tuple) -> tuple:
+    """
+    Flat indices of the left, right, bottom and top neighbours of every point of a
+    grid. Wraps around the edges in the same way as np.roll.
+    """
+    index = np.arange(np.prod(shape)).reshape(shape)
+    return (
+        np.roll(index, 1, axis=0).ravel(),
+        np.roll(index, -1, axis=0).ravel(),
+        np.roll(index, 1, axis=1).ravel(),
+        np.roll(index, -1, axis=1).ravel(),
+    )
+
+
+class StencilPlan:
+    def __init__(
+        self,
+        op_mask: np.ndarray,
+        pow_mask: np.ndarray,
+        k_centre: np.ndarray,
+        k_btm: np.ndarray,
+        k_top: np.ndarray,
+        step_size,
+    ):
+        """
+        Precompiles the masks into flat index arrays and constant terms for each
+        operation so that an iteration only consists of gathers and scatters.
+        """
+        self.shape = op_mask.shape
+        self.step_size = step_size
+        ops = op_mask.ravel()
+        power = pow_mask.ravel()
+        k = k_centre.ravel()
+        neighbours = neighbour_indices(self.shape)
+
+        # Operations 1 to 9 and 11 to 13: cells, weighted neighbours, source and flux
+        # terms
+        self.operations = []
+        for op, weights in OPERATION_WEIGHTS.items():
+            cells = np.flatnonzero(ops == op)
+            if cells.size == 0:
+                continue
+
+            terms = [
+                (neighbour[cells], weight)
+                for neighbour, weight in zip(neighbours, weights[:4])
+                if weight
+            ]
+            source = step_size**2 * power[cells] / k[cells]
+            flux = None
+            if weights[4]:
+                flux = weights[4] * step_size / k[cells]
+            self.operations.append((cells, terms, source, flux))
+
+        # Preallocated scratch space for the sums and gathers of each operation
+        self.scratch = [
+            (np.empty(cells.size), np.empty(cells.size))
+            for cells, _, _, _ in self.operations
+        ]
+
+        # Operation 10: material interfaces
+        cells = np.flatnonzero(ops == 10)
+        k_below = k_btm.ravel()[cells]
+        k_above = k_top.ravel()[cells]
+        self.interface = (
+            cells,
+            neighbours[2][cells],
+            neighbours[3][cells],
+            k_below / (k_below + k_above),
+            k_above / (k_below + k_above),
+        )
+
+    def iterate(
+        self,
+        old: np.ndarray,
+        boundary: Callable,
+        out: np.ndarray = None,
+        relaxation=1.0,
+        forcing: np.ndarray = None,
+    ) -> np.ndarray:
+        """
+        Equivalent to jacobi_poisson_iteration using the precompiled indices. If out
+        is given, the solid points are written into it rather than into a copy of
+        old, in which case its air points must already hold their temperatures.
+        A relaxation factor other than 1 moves each point by that multiple of its
+        Jacobi update. forcing is an additional source for every point, in the units
+        of the Laplacian (K/m^2), as used by the coarse grids of the multigrid solver.
+        """
+        old_flat = old.ravel()
+        if out is None:
+            out = old.copy()
+        new_flat = out.reshape(-1)
+
+        for (cells, terms, source, flux), (total, gathered) in zip(
+            self.operations, self.scratch
+        ):
+            np.copyto(total, source)
+            for neighbour, weight in terms:
+                np.take(old_flat, neighbour, out=gathered)
+                if weight != 1:
+                    gathered *= weight
+                total += gathered
+            if flux is not None:
+                np.take(old_flat, cells, out=gathered)
+                total -= flux * boundary(gathered)
+            if forcing is not None:
+                total += self.step_size**2 * forcing.ravel()[cells]
+            total *= 0.25
+            if relaxation != 1:
+                np.take(old_flat, cells, out=gathered)
+                total -= gathered
+                total *= relaxation
+                total += gathered
+            new_flat[cells] = total
+
+        cells, below, above, w_below, w_above = self.interface
+        interface = w_below * old_flat[below] + w_above * old_flat[above]
+        if forcing is not None:
+            interface += 0.25 * self.step_size**2 * forcing.ravel()[cells]
+        if relaxation != 1:
+            interface = old_flat[cells] + relaxation * (interface - old_flat[cells])
+        new_flat[cells] = interface
+
+        return out
+
+
+def grid_array(shape: tuple, directory=None, name=None, fill=0.0) -> np.ndarray:
+    """
+    Array of the shape of a grid filled with fill. If directory is given it is an
+    np.memmap of the .npy file name in that directory, which np.load can open with
+    mmap_mode.
+    """
+    if directory is None:
+        return np.full(shape, fill)
+
+    # Replacing rather than truncating an existing file keeps earlier memmaps of it
+    # valid
+    path = os.path.join(directory, f"{name}.npy")
+    if os.path.exists(path):
+        os.remove(path)
+    array = np.lib.format.open_memmap(path, mode="w+", shape=shape)
+    array[...] = fill
+
+    return array
+
+
+class FusedStencil:
+    def __init__(
+        self,
+        op_mask: np.ndarray,
+        pow_mask: np.ndarray,
+        k_centre: np.ndarray,
+        step_size,
+        fixed_temps: np.ndarray,
+        directory=None,
+        block_rows=None,
+    ):
+        """
+        Precomputes coefficient arrays from the operation mask so that an iteration
+        is a single weighted 5-point update over the whole grid:
+
+        new = (w_left * t_left + w_right * t_right + w_btm * t_btm + w_top * t_top
+               + source - flux * boundary(t_centre)) / denominator
+
+        The weights, source and flux are stored divided by the denominator. The flux
+        is only stored for the boundary points, with their flat indices in the grid,
+        so that boundary is not evaluated elsewhere. Air points are given a source
+        equal to their value in fixed_temps and a denominator of 1 so that they are
+        left unchanged.
+
+        If directory is given, the coefficient and scratch arrays are memory-mapped
+        .npy files in it (see grid_array). They are computed in blocks of block_rows
+        rows so that the temporaries, including the conductivities below and above
+        each point, are the size of a block.
+        """
+        self.shape = op_mask.shape
+        self.w_left = grid_array(self.shape, directory, "w_left")
+        self.w_right = grid_array(self.shape, directory, "w_right")
+        self.w_btm = grid_array(self.shape, directory, "w_btm")
+        self.w_top = grid_array(self.shape, directory, "w_top")
+        self.source = grid_array(self.shape, directory, "source")
+        boundary_cells = []
+        fluxes = []
+
+        block_rows = block_rows or self.shape[0]
+        for start in range(0, self.shape[0], block_rows):
+            rows = np.s_[start : start + block_rows]
+            ops = op_mask[rows]
+            power = pow_mask[rows]
+            k = k_centre[rows]
+            k_btm = np.roll(k, 1, axis=1)
+            k_top = np.roll(k, -1, axis=1)
+            w_left = self.w_left[rows]
+            w_right = self.w_right[rows]
+            w_btm = self.w_btm[rows]
+            w_top = self.w_top[rows]
+            source = self.source[rows]
+            denominator = np.ones(ops.shape)
+            flux = np.zeros(ops.shape)
+
+            for op, weights in OPERATION_WEIGHTS.items():
+                cells = ops == op
+                w_left[cells] = weights[0]
+                w_right[cells] = weights[1]
+                w_btm[cells] = weights[2]
+                w_top[cells] = weights[3]
+                denominator[cells] = 4
+                source[cells] = step_size**2 * power[cells] / k[cells]
+                flux[cells] = weights[4] * step_size / k[cells]
+
+            # Material interfaces
+            cells = ops == 10
+            w_btm[cells] = k_btm[cells]
+            w_top[cells] = k_top[cells]
+            denominator[cells] = k_btm[cells] + k_top[cells]
+
+            # Air
+            cells = ops == 0
+            source[cells] = fixed_temps[rows][cells]
+
+            for coefficients in (w_left, w_right, w_btm, w_top, source, flux):
+                coefficients /= denominator
+            cells = np.flatnonzero(flux)
+            boundary_cells.append(cells + start * self.shape[1])
+            fluxes.append(flux.ravel()[cells])
+
+        # Boundary points in the order of the grid
+        self.boundary_cells = np.concatenate(boundary_cells)
+        self.flux = np.concatenate(fluxes)
+
+        # Preallocated scratch space for the shifted terms
+        self.scratch = grid_array(self.shape, directory, "scratch")
+
+    def shared_arrays(self) -> dict:
+        """
+        Arrays an iteration reads and writes, which a SharedStencil places in shared
+        memory.
+        """
+        return {name: getattr(self, name) for name in STENCIL_ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict):
+        """
+        Stencil evaluated with the arrays of shared_arrays, e.g. views of shared
+        memory in a worker process.
+        """
+        stencil = cls.__new__(cls)
+        stencil.shape = arrays["source"].shape
+        for name in STENCIL_ARRAYS:
+            setattr(stencil, name, arrays[name])
+
+        return stencil
+
+    def iterate(
+        self,
+        old: np.ndarray,
+        boundary: Callable,
+        out: np.ndarray = None,
+        relaxation=1.0,
+    ) -> np.ndarray:
+        """
+        Equivalent to jacobi_poisson_iteration using the coefficient arrays. Points on
+        the edges of the grid never have a weight towards the opposite edge so the
+        shifted terms are accumulated with slices rather than np.roll. If out is
+        given, the new iteration is written into it. A relaxation factor other than 1
+        moves each point by that multiple of its Jacobi update.
+        """
+        if out is None:
+            out = np.empty(self.shape)
+
+        return self.iterate_rows(old, boundary, out, 0, self.shape[0], relaxation)
+
+    def iterate_rows(
+        self,
+        old: np.ndarray,
+        boundary: Callable,
+        out: np.ndarray,
+        start,
+        stop,
+        relaxation=1.0,
+    ) -> np.ndarray:
+        """
+        Writes the new iteration of the rows start to stop (a strip of the first axis)
+        into out. Only the rows of old from start - 1 to stop + 1 are read, so strips
+        of the same iteration can be evaluated concurrently. old and out must be
+        C-contiguous, as the strip is evaluated on flat views of them, in which the
+        bottom and top neighbours are adjacent (no point has a bottom weight in the
+        first column or a top weight in the last).
+        """
+        if not (old.flags.c_contiguous and out.flags.c_contiguous):
+            raise RuntimeError("The fused stencil requires C-contiguous fields")
+        size = self.shape[1]
+        points = np.s_[start * size : stop * size]
+        left = np.s_[max(start, 1) * size : stop * size]
+        right = np.s_[start * size : min(stop, self.shape[0] - 1) * size]
+        old = old.reshape(-1)
+        new = out.reshape(-1)
+        scratch = self.scratch.reshape(-1)
+
+        # Boundary points of the strip
+        first, last = np.searchsorted(self.boundary_cells, (points.start, points.stop))
+        cells = self.boundary_cells[first:last]
+
+        # The bottom term is written straight into the strip
+        below = np.s_[points.start + 1 : points.stop]
+        np.multiply(
+            self.w_btm.reshape(-1)[below],
+            old[below.start - 1 : below.stop - 1],
+            out=new[below],
+        )
+        new[points.start] = 0
+        new[points] += self.source.reshape(-1)[points]
+        above = np.s_[points.start : points.stop - 1]
+        np.multiply(
+            self.w_top.reshape(-1)[above],
+            old[above.start + 1 : above.stop + 1],
+            out=scratch[above],
+        )
+        new[above] += scratch[above]
+        np.multiply(
+            self.w_left.reshape(-1)[left],
+            old[left.start - size : left.stop - size],
+            out=scratch[left],
+        )
+        new[left] += scratch[left]
+        np.multiply(
+            self.w_right.reshape(-1)[right],
+            old[right.start + size : right.stop + size],
+            out=scratch[right],
+        )
+        new[right] += scratch[right]
+        new[cells] -= self.flux[first:last] * boundary(old[cells])
+        if relaxation != 1:
+            new[points] -= old[points]
+            new[points] *= relaxation
+            new[points] += old[points]
+
+        return out
+
+
+class ThreadedStencil:
+    def __init__(self, stencil, threads):
+        """
+        Partitions the grid of a fused stencil into strips of rows, or the compact
+        array of a compact stencil into ranges of solid points, each updated by a
+        worker of a persistent ThreadPoolExecutor. NumPy releases the GIL inside
+        the ufuncs, so the strips are evaluated on separate cores. Each strip of a
+        fused stencil reads a one-row halo of the old iteration on either side (a
+        compact strip gathers from anywhere in it) and writes only its own rows, and
+        an iteration returns once every strip is done.
+        """
+        self.stencil = stencil
+        self.shape = stencil.shape
+        if isinstance(stencil, CompactStencil):
+            self.shape = stencil.cells.shape
+        bounds = np.linspace(0, self.shape[0], threads + 1).astype(int)
+        self.strips = [
+            (start, stop)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+            if stop > start
+        ]
+        self.executor = ThreadPoolExecutor(max_workers=len(self.strips))
+
+    def map(self, function: Callable, *args) -> list:
+        """
+        Applies function(*args, start, stop) to every strip and waits for all of
+        them.
+        """
+        futures = [
+            self.executor.submit(function, *args, start, stop)
+            for start, stop in self.strips
+        ]
+        return [future.result() for future in futures]
+
+    def iterate(
+        self,
+        old: np.ndarray,
+        boundary: Callable,
+        out: np.ndarray = None,
+        relaxation=1.0,
+    ) -> np.ndarray:
+        """
+        Equivalent to the iterate method of the stencil, evaluated strip by strip on
+        the threads.
+        """
+        if out is None:
+            out = np.empty(self.shape)
+        self.map(
+            lambda start, stop: self.stencil.iterate_rows(
+                old, boundary, out, start, stop, relaxation
+            )
+        )
+
+        return out
+
+    def norms(self, new: np.ndarray, old: np.ndarray) -> tuple:
+        """
+        Norms of new - old and of new, reduced from the sums of squares of each
+        strip.
+        """
+
+        def partial(start, stop):
+            change = new[start:stop] - old[start:stop]
+            return np.vdot(change, change), np.vdot(new[start:stop], new[start:stop])
+
+        change, size = np.sum(self.map(partial), axis=0)
+
+        return np.sqrt(change), np.sqrt(size)
+
+    def close(self):
+        """
+        Shuts down the worker threads.
+        """
+        self.executor.shutdown()
+
+
+class BlockedStencil:
+    def __init__(self, stencil: FusedStencil, block_rows):
+        """
+        Evaluates a fused stencil in blocks of block_rows rows, one after another, so
+        that the temporaries of an iteration are the size of a block rather than of
+        the grid, e.g. for memory-mapped fields.
+        """
+        self.stencil = stencil
+        self.shape = stencil.shape
+        self.blocks = [
+            (start, min(start + block_rows, self.shape[0]))
+            for start in range(0, self.shape[0], block_rows)
+        ]
+
+    def iterate(
+        self,
+        old: np.ndarray,
+        boundary: Callable,
+        out: np.ndarray = None,
+        relaxation=1.0,
+    ) -> np.ndarray:
+        """
+        Equivalent to FusedStencil.iterate, evaluated block by block.
+        """
+        if out is None:
+            out = np.empty(self.shape)
+        for start, stop in self.blocks:
+            self.stencil.iterate_rows(old, boundary, out, start, stop, relaxation)
+
+        return out
+
+    def norms(self, new: np.ndarray, old: np.ndarray) -> tuple:
+        """
+        Norms of new - old and of new, accumulated block by block.
+        """
+        change = size = 0.0
+        for start, stop in self.blocks:
+            difference = new[start:stop] - old[start:stop]
+            change += np.vdot(difference, difference)
+            size += np.vdot(new[start:stop], new[start:stop])
+
+        return np.sqrt(change), np.sqrt(size)
+
+
+# Coefficient and scratch arrays of a fused stencil in the shared memory of a
+# SharedStencil
+STENCIL_ARRAYS = (
+    "w_left",
+    "w_right",
+    "w_btm",
+    "w_top",
+    "source",
+    "boundary_cells",
+    "flux",
+    "scratch",
+)
+
+# Arrays of a compact stencil in the shared memory of a SharedStencil, besides the
+# neighbour tables and weights of its gathers
+COMPACT_ARRAYS = ("source", "w_btm", "w_top", "boundary_cells", "flux", "scratch")
+
+# Commands sent to the worker processes of a SharedStencil
+STOP = 0
+ITERATE = 1
+SWEEP = 2
+
+
+def shared_views(memory: shared_memory.SharedMemory, layout: list) -> dict:
+    """
+    Arrays of the (name, shape, dtype) entries of layout, laid out one after
+    another in a block of shared memory.
+    """
+    arrays = {}
+    offset = 0
+    for name, shape, dtype in layout:
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)
+        offset += arrays[name].nbytes
+
+    return arrays
+
+
+def run_strip(
+    memory, layout, kind, start, stop, boundary, barrier, strip_barrier, control
+):
+    """
+    Updates the rows start to stop of the shared fields with a stencil of class kind
+    on every command until told to stop.
+    """
+    arrays = shared_views(memory, layout)
+    stencil = kind.from_arrays(arrays)
+    fields = (arrays["field_0"], arrays["field_1"])
+    # Only fused stencils are shared with the arrays of red-black sweeps
+    if "red" in arrays:
+        update = arrays["update"]
+        red = arrays["red"][start:stop]
+        colours = (red, ~red)
+
+    while True:
+        barrier.wait()
+        command, index, relaxation = int(control[0]), int(control[1]), control[2]
+        if command == STOP:
+            break
+
+        if command == ITERATE:
+            stencil.iterate_rows(
+                fields[index], boundary, fields[1 - index], start, stop, relaxation
+            )
+        else:
+            # Each colour only reads points of the other colour from the halo rows,
+            # which no strip writes until every strip is done with the colour
+            temps = fields[index]
+            for colour in colours:
+                stencil.iterate_rows(temps, boundary, update, start, stop, relaxation)
+                np.copyto(temps[start:stop], update[start:stop], where=colour)
+                strip_barrier.wait()
+        barrier.wait()
+
+
+def shared_strip_worker(
+    name, layout, kind, start, stop, boundary, barrier, strip_barrier, control
+):
+    """
+    Entry point of a worker process of a SharedStencil. A failure breaks the
+    barriers so that the other processes do not wait forever.
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        run_strip(
+            memory,
+            layout,
+            kind,
+            start,
+            stop,
+            boundary,
+            barrier,
+            strip_barrier,
+            control,
+        )
+    except BaseException:
+        barrier.abort()
+        strip_barrier.abort()
+        raise
+    memory.close()
+
+
+class SharedStencil:
+    def __init__(self, stencil, processes, boundary: Callable):
+        """
+        Splits the grid of a fused stencil into strips of rows, or the compact array
+        of a compact stencil into ranges of solid points, each owned by a worker
+        process. The arrays of the stencil (see shared_arrays) and two temperature
+        fields live in multiprocessing.shared_memory, so the workers read the halos
+        of their neighbours directly from the shared fields and nothing is pickled
+        once they are started. The workers apply boundary to the boundary points
+        and wait on a barrier at the start and end of every iteration. Red-black
+        sweeps require a fused stencil.
+        """
+        self.shape = stencil.shape
+        if isinstance(stencil, CompactStencil):
+            self.shape = stencil.cells.shape
+        self.boundary = boundary
+        arrays = stencil.shared_arrays()
+        layout = [
+            (name, array.shape, array.dtype.str) for name, array in arrays.items()
+        ]
+        layout += [("field_0", self.shape, "f8"), ("field_1", self.shape, "f8")]
+        if isinstance(stencil, FusedStencil):
+            layout += [("update", self.shape, "f8"), ("red", self.shape, "?")]
+        size = sum(
+            int(np.prod(shape)) * np.dtype(dtype).itemsize for _, shape, dtype in layout
+        )
+        self.memory = shared_memory.SharedMemory(create=True, size=size)
+        self.arrays = shared_views(self.memory, layout)
+        for name, array in arrays.items():
+            self.arrays[name][...] = array
+        if "red" in self.arrays:
+            i, j = np.indices(self.shape)
+            self.arrays["red"][...] = (i + j) % 2 == 0
+        self.fields = (self.arrays["field_0"], self.arrays["field_1"])
+
+        bounds = np.linspace(0, self.shape[0], processes + 1).astype(int)
+        strips = [
+            (start, stop)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+            if stop > start
+        ]
+        context = multiprocessing.get_context()
+        self.control = context.RawArray("d", 3)
+        self.barrier = context.Barrier(len(strips) + 1)
+        strip_barrier = context.Barrier(len(strips))
+        self.workers = [
+            context.Process(
+                target=shared_strip_worker,
+                args=(
+                    self.memory.name,
+                    layout,
+                    type(stencil),
+                    start,
+                    stop,
+                    boundary,
+                    self.barrier,
+                    strip_barrier,
+                    self.control,
+                ),
+                daemon=True,
+            )
+            for start, stop in strips
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def run(self, command, index, relaxation=1.0):
+        """
+        Has every worker apply command to the shared field index and waits for them.
+        """
+        self.control[:] = (command, index, relaxation)
+        try:
+            self.barrier.wait()
+            if command != STOP:
+                self.barrier.wait()
+        except threading.BrokenBarrierError:
+            self.release()
+            raise RuntimeError("A worker process of the shared stencil failed")
+
+    def share(self, temps: np.ndarray) -> int:
+        """
+        Index of temps among the shared fields, copying it into the first field if it
+        is not one of them.
+        """
+        if temps is self.fields[1]:
+            return 1
+        if temps is not self.fields[0]:
+            np.copyto(self.fields[0], temps)
+
+        return 0
+
+    def iterate(
+        self,
+        old: np.ndarray,
+        boundary: Callable,
+        out: np.ndarray = None,
+        relaxation=1.0,
+    ) -> np.ndarray:
+        """
+        Equivalent to the iterate method of the stencil, evaluated strip by strip by
+        the worker processes. If old and out are the two shared fields nothing is
+        copied, and otherwise old is copied into shared memory and the new iteration
+        out of it. boundary must be the function the workers were started with.
+        """
+        if boundary is not self.boundary:
+            raise RuntimeError("The workers were started with another boundary")
+
+        index = self.share(old)
+        self.run(ITERATE, index, relaxation)
+        new = self.fields[1 - index]
+        if out is None:
+            return new.copy()
+        if out is not new:
+            np.copyto(out, new)
+
+        return out
+
+    def sweep(self, temps: np.ndarray, boundary: Callable, omega) -> np.ndarray:
+        """
+        Performs one red-black successive over-relaxation sweep of temps in place,
+        like sor.RedBlackSweep, with every strip finishing the red points before any
+        black point is updated.
+        """
+        if boundary is not self.boundary:
+            raise RuntimeError("The workers were started with another boundary")
+        if "red" not in self.arrays:
+            raise RuntimeError("Red-black sweeps require a fused stencil")
+
+        index = self.share(temps)
+        self.run(SWEEP, index, omega)
+        if temps is not self.fields[index]:
+            np.copyto(temps, self.fields[index])
+
+        return temps
+
+    def close(self):
+        """
+        Stops the worker processes and releases the shared memory, unless this has
+        already happened. Arrays returned by the workers must be copied out of the
+        shared fields before closing.
+        """
+        if self.memory is None:
+            return
+
+        self.run(STOP, 0)
+        self.release()
+
+    def release(self):
+        """
+        Waits for the worker processes to exit and frees the shared memory.
+        """
+        for worker in self.workers:
+            worker.join()
+        self.arrays = None
+        self.fields = None
+
+        # Views of the fields may outlive the stencil after an exception, in which
+        # case the mapping is freed with them
+        try:
+            self.memory.close()
+        except BufferError:
+            pass
+        self.memory.unlink()
+        self.memory = None
+
+
+class CompactStencil:
+    def __init__(
+        self,
+        op_mask: np.ndarray,
+        pow_mask: np.ndarray,
+        k_centre: np.ndarray,
+        k_btm: np.ndarray,
+        k_top: np.ndarray,
+        step_size,
+        fixed_temps: np.ndarray,
+    ):
+        """
+        Stores only the solid points of the grid, in a flat array. The left and right
+        neighbours of each solid point are precompiled into a table of positions in
+        that array, and all weights are divided by the denominator of the operation,
+        so that an iteration is a weighted sum of two gathers and two shifted slices.
+        Air points are neither stored nor iterated. Air neighbours with a weight (e.g.
+        beside fins one point wide) are held at their value in fixed_temps, as in the
+        other kernels, and are added to the source.
+        """
+        self.shape = op_mask.shape
+        ops = op_mask.ravel().astype(int)
+        k = k_centre.ravel()
+        neighbours = neighbour_indices(self.shape)
+
+        # Flat indices of the solid points and their position in the compact array
+        self.cells = np.flatnonzero(ops != 0)
+        self.position = np.full(ops.size, -1)
+        self.position[self.cells] = np.arange(self.cells.size)
+        cell_ops = ops[self.cells]
+        cell_k = k[self.cells]
+
+        # Neighbour weights and flux multipliers of each operation
+        table = np.zeros((max(OPERATION_WEIGHTS) + 1, 5))
+        for op, weights in OPERATION_WEIGHTS.items():
+            table[op] = weights
+        weights = table[cell_ops]
+        denominator = np.full(self.cells.size, 4.0)
+
+        # Material interfaces
+        interface = cell_ops == 10
+        weights[interface, 2] = k_btm.ravel()[self.cells[interface]]
+        weights[interface, 3] = k_top.ravel()[self.cells[interface]]
+        denominator[interface] = weights[interface, 2] + weights[interface, 3]
+
+        # Moving the terms of air neighbours into the source
+        fixed = fixed_temps.ravel()
+        air_terms = np.zeros(self.cells.size)
+        for direction in range(4):
+            neighbour = neighbours[direction][self.cells]
+            air = (weights[:, direction] != 0) & (ops[neighbour] == 0)
+            air_terms[air] += weights[air, direction] * fixed[neighbour[air]]
+            weights[air, direction] = 0
+
+        # Left and right neighbours are gathered, and neighbours without a weight
+        # point to the point itself
+        self.terms = []
+        for direction in range(2):
+            coupled = weights[:, direction] != 0
+            neighbour = np.arange(self.cells.size)
+            neighbour[coupled] = self.position[
+                neighbours[direction][self.cells[coupled]]
+            ]
+            self.terms.append((neighbour, weights[:, direction] / denominator))
+
+        # The solid points are in the order of the grid, so a solid bottom or top
+        # neighbour is always the previous or next point of the compact array
+        self.w_btm = weights[:, 2] / denominator
+        self.w_top = weights[:, 3] / denominator
+
+        self.source = np.where(
+            interface, 0, step_size**2 * pow_mask.ravel()[self.cells] / cell_k
+        )
+        self.source += air_terms
+        self.source /= denominator
+
+        # Boundary points and their flux terms
+        self.boundary_cells = np.flatnonzero(weights[:, 4])
+        self.flux = (weights[:, 4] * step_size / cell_k)[self.boundary_cells]
+        self.flux /= denominator[self.boundary_cells]
+
+        # Preallocated scratch space for the gathers
+        self.scratch = np.empty(self.cells.size)
+
+    def shared_arrays(self) -> dict:
+        """
+        Arrays an iteration reads and writes, which a SharedStencil places in shared
+        memory.
+        """
+        arrays = {name: getattr(self, name) for name in COMPACT_ARRAYS}
+        for direction, (neighbour, weight) in enumerate(self.terms):
+            arrays[f"neighbour_{direction}"] = neighbour
+            arrays[f"weight_{direction}"] = weight
+
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict):
+        """
+        Stencil evaluated with the arrays of shared_arrays, e.g. views of shared
+        memory in a worker process. It iterates but cannot gather or scatter grids.
+        """
+        stencil = cls.__new__(cls)
+        for name in COMPACT_ARRAYS:
+            setattr(stencil, name, arrays[name])
+        stencil.terms = [
+            (arrays[f"neighbour_{direction}"], arrays[f"weight_{direction}"])
+            for direction in range(2)
+        ]
+
+        return stencil
+
+    def gather(self, grid: np.ndarray) -> np.ndarray:
+        """
+        Compact array of the solid point values of a grid.
+        """
+        return grid.ravel()[self.cells]
+
+    def scatter(self, values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+        """
+        Writes a compact array into a copy of the grid.
+        """
+        grid = grid.copy()
+        grid.ravel()[self.cells] = values
+
+        return grid
+
+    def iterate(
+        self,
+        old: np.ndarray,
+        boundary: Callable,
+        out: np.ndarray = None,
+        relaxation=1.0,
+    ) -> np.ndarray:
+        """
+        Equivalent to jacobi_poisson_iteration on the compact array of solid points.
+        If out is given, the new iteration is written into it. A relaxation factor
+        other than 1 moves each point by that multiple of its Jacobi update.
+        """
+        if out is None:
+            out = np.empty(self.cells.size)
+
+        return self.iterate_rows(old, boundary, out, 0, self.cells.size, relaxation)
+
+    def iterate_rows(
+        self,
+        old: np.ndarray,
+        boundary: Callable,
+        out: np.ndarray,
+        start,
+        stop,
+        relaxation=1.0,
+    ) -> np.ndarray:
+        """
+        Writes the new iteration of the positions start to stop of the compact array
+        (a strip of its only axis) into out. The gathers may read any position of
+        old but only those positions of out are written, so strips of the same
+        iteration can be evaluated concurrently.
+        """
+        rows = np.s_[start:stop]
+        below = np.s_[max(start, 1) : stop]
+        above = np.s_[start : min(stop, self.source.size - 1)]
+        scratch = self.scratch
+
+        # Boundary points of the strip
+        first, last = np.searchsorted(self.boundary_cells, (start, stop))
+        cells = self.boundary_cells[first:last]
+
+        np.copyto(out[rows], self.source[rows])
+        out[cells] -= self.flux[first:last] * boundary(old[cells])
+        for neighbour, weight in self.terms:
+            np.take(old, neighbour[rows], out=scratch[rows])
+            scratch[rows] *= weight[rows]
+            out[rows] += scratch[rows]
+        np.multiply(
+            self.w_btm[below], old[below.start - 1 : below.stop - 1], out=scratch[below]
+        )
+        out[below] += scratch[below]
+        np.multiply(
+            self.w_top[above], old[above.start + 1 : above.stop + 1], out=scratch[above]
+        )
+        out[above] += scratch[above]
+        if relaxation != 1:
+            out[rows] -= old[rows]
+            out[rows] *= relaxation
+            out[rows] += old[rows]
+
+        return out
@@ -0,0 +1,202 @@
+import numpy as np
+from typing import Callable
+from .jacobi import StencilPlan
+from .sor import RedBlackSweep, grid_relaxation
+
+
+class Level:
+    def __init__(
+        self,
+        op_mask: np.ndarray,
+        pow_mask: np.ndarray,
+        k_mask: np.ndarray,
+        step_size,
+    ):
+        """
+        Operations of a single grid of the multigrid hierarchy.
+        """
+        k_btm = np.roll(k_mask, 1, axis=1)
+        k_top = np.roll(k_mask, -1, axis=1)
+
+        self.op_mask = op_mask
+        self.pow_mask = pow_mask
+        self.k_mask = k_mask
+        self.step_size = step_size
+        self.shape = op_mask.shape
+        self.solid = op_mask != 0
+        self.plan = StencilPlan(op_mask, pow_mask, k_mask, k_btm, k_top, step_size)
+        self.sweeper = RedBlackSweep(op_mask, pow_mask, k_mask, k_btm, k_top, step_size)
+
+    def residual(
+        self, temps: np.ndarray, boundary: Callable, forcing: np.ndarray = None
+    ) -> np.ndarray:
+        """
+        Residual of the discrete equations in the units of the Laplacian (K/m^2), so
+        that the residuals of different grids can be compared. This is 4 / h^2 times
+        the Jacobi update and is zero at air points.
+        """
+        residual = self.plan.iterate(temps, boundary, forcing=forcing)
+        residual -= temps
+        residual *= 4 / self.step_size**2
+
+        return residual
+
+    def smooth(
+        self,
+        temps: np.ndarray,
+        boundary: Callable,
+        sweeps,
+        forcing: np.ndarray = None,
+        omega=1.0,
+    ):
+        """
+        Applies red-black Gauss-Seidel (or SOR) sweeps to temps in place.
+        """
+        for _ in range(sweeps):
+            self.sweeper.sweep(temps, boundary, omega, forcing=forcing)
+
+
+def full_weighting(values: np.ndarray, axis, length) -> np.ndarray:
+    """
+    Restricts values along one axis onto a grid of twice the step size with the
+    weights (1/4, 1/2, 1/4).
+    """
+    values = np.moveaxis(values, axis, 0)
+    padded = np.zeros((values.shape[0] + 2,) + values.shape[1:])
+    padded[1:-1] = values
+    smoothed = 0.25 * padded[:-2] + 0.5 * padded[1:-1] + 0.25 * padded[2:]
+
+    coarse = np.zeros((length,) + values.shape[1:])
+    coarse[: smoothed[::2].shape[0]] = smoothed[::2][:length]
+
+    return np.moveaxis(coarse, 0, axis)
+
+
+def linear_interpolation(values: np.ndarray, axis, length) -> np.ndarray:
+    """
+    Interpolates values along one axis onto a grid of half the step size.
+    """
+    values = np.moveaxis(values, axis, 0)
+    interpolated = np.zeros((2 * values.shape[0] - 1,) + values.shape[1:])
+    interpolated[::2] = values
+    interpolated[1::2] = 0.5 * (values[:-1] + values[1:])
+
+    fine = np.zeros((length,) + values.shape[1:])
+    fine[: interpolated.shape[0]] = interpolated[:length]
+
+    return np.moveaxis(fine, 0, axis)
+
+
+def masked_transfer(
+    values: np.ndarray, solid: np.ndarray, shape: tuple, along: Callable
+) -> tuple:
+    """
+    Transfers values between grids using only their solid points, by applying the
+    one-dimensional transfer along each axis to both the values and the solid mask
+    and normalising. The coarse and fine grids of the system do not overlay exactly
+    since the objects are rounded to each step size. Also returns the mask of points
+    that received a value.
+    """
+    numerator = np.where(solid, values, 0.0)
+    denominator = solid.astype(float)
+    for axis in (0, 1):
+        numerator = along(numerator, axis, shape[axis])
+        denominator = along(denominator, axis, shape[axis])
+
+    covered = denominator > 0
+    transferred = np.zeros(shape)
+    np.divide(numerator, denominator, out=transferred, where=covered)
+
+    return transferred, covered
+
+
+def restrict_temps(fine: Level, coarse: Level, temps: np.ndarray) -> np.ndarray:
+    """
+    Restricts a temperature field onto the coarser grid. Coarse points that are not
+    covered by any solid fine point are given the mean solid temperature.
+    """
+    coarse_temps, covered = masked_transfer(
+        temps, fine.solid, coarse.shape, full_weighting
+    )
+    coarse_temps[~covered] = np.mean(temps[fine.solid])
+
+    return coarse_temps
+
+
+def prolong_temps(
+    coarse: Level, fine: Level, coarse_temps: np.ndarray, fine_temps: np.ndarray
+) -> np.ndarray:
+    """
+    Interpolates a coarse temperature field onto the solid points of fine_temps that
+    are covered by solid coarse points.
+    """
+    interpolated, covered = masked_transfer(
+        coarse_temps, coarse.solid, fine.shape, linear_interpolation
+    )
+    region = fine.solid & covered
+    fine_temps[region] = interpolated[region]
+
+    return fine_temps
+
+
+def v_cycle(
+    levels: list,
+    index,
+    temps: np.ndarray,
+    boundary: Callable,
+    forcing: np.ndarray,
+    pre_sweeps,
+    post_sweeps,
+    coarse_sweeps,
+) -> np.ndarray:
+    """
+    Full approximation scheme (FAS) V-cycle on temps in place, starting from
+    levels[index]. The coarse grids solve for the full temperature rather than an
+    error so that the nonlinear natural convection boundary is treated exactly. The
+    coarse equations are corrected by the forcing
+
+    tau = R(residual_h(T_h)) - residual_2h(R(T_h))
+
+    and the change of the coarse solution is interpolated back as a correction.
+    """
+    level = levels[index]
+
+    # Coarsest grid: over-relaxed sweeps
+    if index == len(levels) - 1:
+        omega = grid_relaxation(level.shape)
+        level.smooth(temps, boundary, coarse_sweeps, forcing, omega)
+        return temps
+
+    level.smooth(temps, boundary, pre_sweeps, forcing)
+
+    # Restricting the solution and residual to the coarser grid
+    coarse = levels[index + 1]
+    residual = level.residual(temps, boundary, forcing)
+    coarse_temps = restrict_temps(level, coarse, temps)
+    restricted_temps = coarse_temps.copy()
+    coarse_forcing, _ = masked_transfer(
+        residual, level.solid, coarse.shape, full_weighting
+    )
+    coarse_forcing -= coarse.residual(restricted_temps, boundary)
+    coarse_forcing[~coarse.solid] = 0
+
+    v_cycle(
+        levels,
+        index + 1,
+        coarse_temps,
+        boundary,
+        coarse_forcing,
+        pre_sweeps,
+        post_sweeps,
+        coarse_sweeps,
+    )
+
+    # Interpolating the coarse correction
+    correction, _ = masked_transfer(
+        coarse_temps - restricted_temps, coarse.solid, level.shape, linear_interpolation
+    )
+    temps[level.solid] += correction[level.solid]
+
+    level.smooth(temps, boundary, post_sweeps, forcing)
+
+    return temps
@@ -1,6 +1,37 @@
+import inspect
+import os
+import time
 import numpy as np
+import scipy.sparse.linalg as splinalg
 from typing import Callable
 from . import jacobi
+from . import anderson
+from . import sor
+from . import multigrid
+from . import assembly
+from . import energy
+from . import heat_equations as he
+
+# Number of initial Gauss-Seidel sweeps used to observe the contraction rate when
+# the over-relaxation factor is adaptive
+ESTIMATION_SWEEPS = 50
+
+# Maximum number of times a Newton step is halved when it fails to reduce the
+# residual
+MAX_STEP_HALVINGS = 20
+
+# Name of the relative tolerance of GMRES, which is tol before scipy 1.12
+GMRES_TOLERANCE = (
+    "rtol" if "rtol" in inspect.signature(splinalg.gmres).parameters else "tol"
+)
+
+# Approximate number of points in a block of rows of memory-mapped fields when no
+# block size is given
+MEMMAP_BLOCK_POINTS = 2**20
+
+# Largest change between checks of the contraction ratio of the energy imbalance,
+# relative to one less the ratio, for which the remaining change is extrapolated
+STEADY_CONTRACTION = 0.1
 
 
 def fractional_change(current_array, previous_array):
@@ -14,6 +45,42 @@ def fractional_change(current_array, previous_array):
     return abs(numerator / denominator)
 
 
+def save_checkpoint(path, key, temps: np.ndarray, counter, state: dict):
+    """
+    Writes a temperature field, the iteration counter and the convergence state (a
+    dictionary of floats or None) to an .npz checkpoint, together with the key it
+    belongs to. The file is written under a temporary name and then renamed, so an
+    interrupted write never replaces the last complete checkpoint.
+    """
+    state = {
+        name: np.nan if value is None else value for name, value in state.items()
+    }
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        np.savez(file, key=key, temps=temps, counter=counter, **state)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path, key, shape: tuple):
+    """
+    Reads a checkpoint written by save_checkpoint. Returns the temperature field,
+    the iteration counter and the convergence state, or None if there is no
+    checkpoint for this key and grid shape.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path) as stored:
+        if str(stored["key"]) != key or stored["temps"].shape != shape:
+            return None
+        state = {
+            name: None if np.isnan(stored[name]) else float(stored[name])
+            for name in stored.files
+            if name not in ("key", "temps", "counter")
+        }
+        return stored["temps"], int(stored["counter"]), state
+
+
 def poisson_solve(
     initial_temps: np.ndarray,
     op_mask: np.ndarray,
@@ -24,10 +91,500 @@ def poisson_solve(
     stopping_condition,
     max_iterations,
     boundary_func: Callable,
+    kernel="plan",
+    pingpong=False,
+    anderson_depth=0,
+    stopping="change",
+    check_interval=100,
+    relaxation=1.0,
+    heat_generated=None,
+    energy_history: list = None,
+    time_budget=None,
+    mean_history: list = None,
+    threads=1,
+    processes=1,
+    checkpoint=None,
+    checkpoint_interval=100000,
+    checkpoint_key="",
+    resume=False,
+    memmap_dir=None,
+    block_rows=None,
 ) -> np.ndarray:
     """
     Solves the Poisson equation using an iterative method. Applies Neumann boundary
     conditions.
+
+    kernel selects how each Jacobi iteration is evaluated:
+    - plan:    gathers and scatters over the precompiled indices of each operation.
+    - fused:   a single weighted 5-point update over the whole grid.
+    - compact: a weighted update of only the solid points, stored in a flat array
+               with a precompiled neighbour table. Air points are not iterated.
+
+    With threads above 1, the fused kernel is evaluated in that many strips of rows,
+    or the compact kernel in that many ranges of its solid points, on a persistent
+    pool of threads (see jacobi.ThreadedStencil), as are the norms of the residual
+    stopping condition. Likewise, with processes above 1 the strips or ranges are
+    owned by worker processes sharing the fields and stencil arrays through shared
+    memory (see jacobi.SharedStencil), which is copy-free with pingpong.
+
+    With block_rows, the fused kernel is evaluated in blocks of that many rows (see
+    jacobi.BlockedStencil). If memmap_dir is given, the coefficient and scratch
+    arrays of the fused kernel, the two pingpong fields and the convergence errors
+    are np.memmap .npy files in that directory (out of core), processed in blocks of
+    block_rows rows (by default about MEMMAP_BLOCK_POINTS points). The solution is
+    returned as a memmap of temps.npy in memmap_dir, which np.load can open with
+    mmap_mode.
+
+    With pingpong, the iterations alternate between two preallocated temperature
+    buffers and the convergence errors are only calculated once the loop exits.
+
+    A non-zero anderson_depth applies Anderson acceleration with that history depth
+    to the Jacobi iterations (not combined with pingpong). It is not combined with
+    the residual stopping condition either: the mixed iterates neither change
+    monotonically nor contract at the rate of the Jacobi iteration, so the
+    contraction rate does not give the remaining error.
+
+    A relaxation factor below 1 (weighted Jacobi) damps the checkerboard modes of the
+    boundary points, which the explicit boundary heat flux makes slightly unstable
+    once the smooth modes have decayed (e.g. 0.95).
+
+    stopping selects the stopping condition:
+    - change:   the fractional change of the microprocessor temperatures between
+                consecutive iterations.
+    - residual: checked every check_interval iterations. The change of an iteration
+                is the discrete residual of the whole grid scaled by the stencil
+                diagonal. Its decrease since the last check gives the contraction
+                rate, from which the remaining iteration error is estimated as
+                change * rate / (1 - rate). The solve stops once this is below
+                stopping_condition relative to the solution, and the convergence
+                errors are scaled in the same way. It also stops if the residual
+                grows again after contracting (see relaxation).
+    - energy:   checked every check_interval iterations. The global energy
+                imbalance, the heat generated (heat_generated, W per unit depth)
+                less the heat dissipated through the boundary points relative to
+                the heat generated, is evaluated. The discretisation is not exactly
+                conservative, so the imbalance converges to a small value that
+                decreases with the step size rather than to zero. The solve stops
+                once the change of the imbalance still to come, extrapolated from
+                the contraction of its changes between checks, is below
+                stopping_condition. The contraction must be steady between checks
+                (see STEADY_CONTRACTION), as the imbalance can turn before it
+                settles. The convergence errors are scaled as for the residual with
+                the contraction rate per iteration this implies.
+
+    If energy_history is a list, (iteration, imbalance) is appended to it every
+    check_interval iterations, whichever stopping condition is used. Likewise for
+    mean_history and the mean temperature of the microprocessor.
+
+    time_budget is a wall-clock limit in seconds after which the current iteration
+    is returned, like max_iterations.
+
+    If checkpoint is a path, the temperature field, iteration counter and convergence
+    state are written to it (see save_checkpoint) every checkpoint_interval
+    iterations and when the solve returns, labelled with checkpoint_key (e.g. a hash
+    of the geometry and step size). With resume, a checkpoint at that path with the
+    same key and grid shape replaces initial_temps and the solve continues from its
+    iteration, with max_iterations counting the iterations of both runs. Anderson
+    acceleration restarts with an empty history.
+    """
+    if time_budget is not None:
+        deadline = time.perf_counter() + time_budget
+
+    if stopping not in ("change", "residual", "energy"):
+        raise RuntimeError(f"Unknown stopping condition: {stopping}")
+
+    monitor_energy = stopping == "energy" or energy_history is not None
+    if monitor_energy:
+        if heat_generated is None:
+            raise RuntimeError("The energy balance requires heat_generated")
+        balance = energy.EnergyBalance(op_mask, step_size, heat_generated)
+
+    # Microprocessor index bounds
+    xmin = convergence_region["xmin"]
+    xmax = convergence_region["xmax"]
+    ymin = convergence_region["ymin"]
+    ymax = convergence_region["ymax"]
+
+    if memmap_dir is not None:
+        if kernel != "fused" or not pingpong:
+            raise RuntimeError(
+                "Memory-mapped fields require the fused kernel and pingpong"
+            )
+        os.makedirs(memmap_dir, exist_ok=True)
+        if block_rows is None:
+            block_rows = max(1, MEMMAP_BLOCK_POINTS // op_mask.shape[1])
+
+    # Determining the mask of thermal conductivities to the bottom and top of their
+    # original points. The fused kernel derives them block by block.
+    if kernel != "fused":
+        k_btm = np.roll(k_mask, 1, axis=1)
+        k_top = np.roll(k_mask, -1, axis=1)
+
+    # Precompiling the operations so that the masks are only evaluated once
+    if kernel == "plan":
+        stencil = jacobi.StencilPlan(op_mask, pow_mask, k_mask, k_btm, k_top, step_size)
+    elif kernel == "fused":
+        stencil = jacobi.FusedStencil(
+            op_mask,
+            pow_mask,
+            k_mask,
+            step_size,
+            initial_temps,
+            directory=memmap_dir,
+            block_rows=block_rows,
+        )
+    elif kernel == "compact":
+        stencil = jacobi.CompactStencil(
+            op_mask, pow_mask, k_mask, k_btm, k_top, step_size, initial_temps
+        )
+        # Still gathers and scatters the grid if the iterations are threaded
+        compact = stencil
+    else:
+        raise RuntimeError(f"Unknown kernel: {kernel}")
+
+    if threads > 1 and processes > 1:
+        raise RuntimeError("Threads and processes are not combined")
+    if threads > 1:
+        if kernel not in ("fused", "compact"):
+            raise RuntimeError(
+                "Threaded iterations require the fused or compact kernel"
+            )
+        stencil = jacobi.ThreadedStencil(stencil, threads)
+    elif processes > 1:
+        if kernel not in ("fused", "compact"):
+            raise RuntimeError(
+                "Shared-memory processes require the fused or compact kernel"
+            )
+        stencil = jacobi.SharedStencil(stencil, processes, boundary_func)
+    if block_rows is not None:
+        if kernel != "fused" or threads > 1 or processes > 1:
+            raise RuntimeError("Blocks of rows require the fused kernel on one thread")
+        stencil = jacobi.BlockedStencil(stencil, block_rows)
+
+    # Microprocessor points, as positions in the compact array of solid points for
+    # the compact kernel
+    region = np.s_[xmin:xmax, ymin:ymax]
+    if kernel == "compact":
+        indices = np.arange(op_mask.size).reshape(op_mask.shape)[region].ravel()
+        region = compact.position[indices]
+        if monitor_energy:
+            balance.cells = compact.position[balance.cells]
+
+    if anderson_depth:
+        if pingpong:
+            raise RuntimeError("Anderson acceleration does not support pingpong")
+        if stopping == "residual":
+            raise RuntimeError(
+                "Anderson acceleration does not support the residual stopping condition"
+            )
+        mixer = anderson.AndersonMixing(anderson_depth)
+
+    # Residual norm or change of the energy imbalance at the last check and the
+    # observed contraction rate of the residual
+    previous_change = None
+    rate = None
+    previous_imbalance = None
+
+    # Setting the solution to the initial temperature distribution guess, or to the
+    # last checkpoint
+    if memmap_dir is None:
+        solution = initial_temps.copy()
+    else:
+        solution = jacobi.grid_array(initial_temps.shape, memmap_dir, "temps")
+        np.copyto(solution, initial_temps)
+        output = solution
+    counter = 0
+    stored = None
+    if resume and checkpoint is not None:
+        stored = load_checkpoint(checkpoint, checkpoint_key, initial_temps.shape)
+    if stored is not None:
+        temps, counter, state = stored
+        np.copyto(solution, temps)
+        previous_change = state["previous_change"]
+        rate = state["rate"]
+        previous_imbalance = state["previous_imbalance"]
+        print(f"Resuming from iteration {counter}")
+    if kernel == "compact":
+        solution = compact.gather(solution)
+    if processes > 1:
+        np.copyto(stencil.fields[0], solution)
+        solution = stencil.fields[0]
+    if pingpong:
+        if memmap_dir is None:
+            old_solution = solution.copy()
+        else:
+            old_solution = jacobi.grid_array(solution.shape, memmap_dir, "old_temps")
+            np.copyto(old_solution, solution)
+        if processes > 1:
+            np.copyto(stencil.fields[1], solution)
+            old_solution = stencil.fields[1]
+
+    # Closing the worker threads or processes however the loop exits
+    try:
+        # Track max iterations
+        while True:
+            # Calculating the next iteration
+            if pingpong:
+                old_solution, solution = solution, old_solution
+                stencil.iterate(
+                    old_solution, boundary_func, out=solution, relaxation=relaxation
+                )
+            else:
+                old_solution = solution.copy()
+                solution = stencil.iterate(
+                    old_solution, boundary_func, relaxation=relaxation
+                )
+                if anderson_depth:
+                    solution = mixer.mix(old_solution, solution)
+
+            counter += 1
+            if counter > max_iterations:
+                print("Max iterations reached")
+                break
+            if time_budget is not None and time.perf_counter() > deadline:
+                print("Time budget reached")
+                break
+
+            # Writing a checkpoint of the field and convergence state
+            if checkpoint is not None and counter % checkpoint_interval == 0:
+                temps = solution
+                if kernel == "compact":
+                    temps = compact.scatter(solution, initial_temps)
+                state = dict(
+                    previous_change=previous_change,
+                    rate=rate,
+                    previous_imbalance=previous_imbalance,
+                )
+                save_checkpoint(checkpoint, checkpoint_key, temps, counter, state)
+
+            # Monitoring the microprocessor temperature and the energy balance
+            if mean_history is not None and counter % check_interval == 0:
+                mean_history.append((counter, np.mean(solution[region])))
+            if monitor_energy and counter % check_interval == 0:
+                imbalance = balance.imbalance(solution, boundary_func)
+                if energy_history is not None:
+                    energy_history.append((counter, imbalance))
+
+            # Check for convergence of microprocessor temperatures
+            if stopping == "change":
+                frac_change = fractional_change(solution[region], old_solution[region])
+                if frac_change < stopping_condition:
+                    break
+
+            # Check for convergence of the energy balance
+            elif stopping == "energy" and counter % check_interval == 0:
+                if previous_imbalance is not None:
+                    change = imbalance - previous_imbalance
+                    if previous_change:
+                        # The ratio of the changes only settles once the imbalance
+                        # no longer turns
+                        observed = change / previous_change
+                        steady = rate is not None and abs(
+                            observed - rate**check_interval
+                        ) <= STEADY_CONTRACTION * (1 - observed)
+                        rate = None
+                        if 0 < observed < 1:
+                            rate = observed ** (1 / check_interval)
+                        if steady and rate is not None:
+                            remaining = abs(change) * observed / (1 - observed)
+                            if remaining < stopping_condition:
+                                break
+                    previous_change = change
+                previous_imbalance = imbalance
+
+            # Check for convergence from the residual and contraction rate
+            elif stopping == "residual" and counter % check_interval == 0:
+                if threads > 1 or block_rows is not None:
+                    change, size = stencil.norms(solution, old_solution)
+                else:
+                    change = np.linalg.norm(solution - old_solution)
+                    size = np.linalg.norm(solution)
+                if previous_change:
+                    observed = (change / previous_change) ** (1 / check_interval)
+                    if observed >= 1 and rate is not None:
+                        print(
+                            "Residual growing after contracting: iterations diverging"
+                        )
+                        break
+                    if observed < 1:
+                        rate = observed
+                        error = change * rate / (1 - rate)
+                        if error < stopping_condition * size:
+                            break
+                previous_change = change
+
+        # Copying the fields out of shared memory
+        if processes > 1:
+            solution = solution.copy()
+            old_solution = old_solution.copy()
+    finally:
+        if threads > 1 or processes > 1:
+            stencil.close()
+
+    if block_rows is None:
+        convergence_errors = abs(solution - old_solution)
+    else:
+        convergence_errors = jacobi.grid_array(solution.shape, memmap_dir, "errors")
+        for start, stop in stencil.blocks:
+            rows = np.s_[start:stop]
+            block = convergence_errors[rows]
+            np.subtract(solution[rows], old_solution[rows], out=block)
+            np.abs(block, out=block)
+    if rate is not None:
+        convergence_errors *= rate / (1 - rate)
+
+    # The last iteration may be in the second memory-mapped field
+    if memmap_dir is not None:
+        if solution is not output:
+            for start, stop in stencil.blocks:
+                output[start:stop] = solution[start:stop]
+            solution = output
+        solution.flush()
+
+    # Scattering the solid points back onto the grid
+    if kernel == "compact":
+        solution = compact.scatter(solution, initial_temps)
+        convergence_errors = compact.scatter(
+            convergence_errors, np.zeros(initial_temps.shape)
+        )
+
+    if checkpoint is not None:
+        state = dict(
+            previous_change=previous_change,
+            rate=rate,
+            previous_imbalance=previous_imbalance,
+        )
+        save_checkpoint(checkpoint, checkpoint_key, solution, counter, state)
+
+    return solution, convergence_errors
+
+
+def sor_solve(
+    initial_temps: np.ndarray,
+    op_mask: np.ndarray,
+    pow_mask: np.ndarray,
+    k_mask: np.ndarray,
+    convergence_region: dict,
+    step_size,
+    stopping_condition,
+    max_iterations,
+    boundary_func: Callable,
+    omega=None,
+    processes=1,
+) -> np.ndarray:
+    """
+    Solves the Poisson equation using red-black successive over-relaxation with the
+    same operations and stopping condition as poisson_solve.
+
+    omega is the over-relaxation factor. If None it is estimated from the dimensions
+    of the grid and if "adaptive" it is estimated from the contraction rate of the
+    first ESTIMATION_SWEEPS Gauss-Seidel sweeps.
+
+    With processes above 1 the sweeps are performed by worker processes owning
+    strips of rows of a fused stencil in shared memory (see jacobi.SharedStencil).
+    """
+    # Microprocessor index bounds
+    xmin = convergence_region["xmin"]
+    xmax = convergence_region["xmax"]
+    ymin = convergence_region["ymin"]
+    ymax = convergence_region["ymax"]
+
+    if processes > 1:
+        sweeper = jacobi.SharedStencil(
+            jacobi.FusedStencil(op_mask, pow_mask, k_mask, step_size, initial_temps),
+            processes,
+            boundary_func,
+        )
+    else:
+        # Determining the mask of thermal conductivities to the bottom and top of
+        # their original points
+        k_btm = np.roll(k_mask, 1, axis=1)
+        k_top = np.roll(k_mask, -1, axis=1)
+        sweeper = sor.RedBlackSweep(
+            op_mask, pow_mask, k_mask, k_btm, k_top, step_size
+        )
+
+    # Choosing the over-relaxation factor
+    adaptive = omega == "adaptive"
+    if adaptive:
+        omega = 1.0
+        changes = []
+    elif omega is None:
+        omega = sor.grid_relaxation(op_mask.shape)
+
+    # Setting the solution to the initial temperature distribution guess
+    solution = initial_temps.copy()
+    if processes > 1:
+        solution = sweeper.fields[0]
+        np.copyto(solution, initial_temps)
+    old_solution = np.empty_like(solution)
+
+    # Closing the worker processes however the loop exits
+    try:
+        # Track max iterations
+        counter = 0
+        while True:
+            np.copyto(old_solution, solution)
+            sweeper.sweep(solution, boundary_func, omega)
+
+            counter += 1
+            if counter > max_iterations:
+                print("Max iterations reached")
+                break
+
+            # Check for convergence of microprocessor temperatures
+            frac_change = fractional_change(
+                solution[xmin:xmax, ymin:ymax], old_solution[xmin:xmax, ymin:ymax]
+            )
+            if frac_change < stopping_condition:
+                break
+
+            # Observing the contraction rate of the Gauss-Seidel sweeps
+            if adaptive and counter <= ESTIMATION_SWEEPS:
+                changes.append(np.linalg.norm(solution - old_solution))
+                if counter == ESTIMATION_SWEEPS:
+                    half = ESTIMATION_SWEEPS // 2
+                    rate = (changes[-1] / changes[half - 1]) ** (1 / half)
+                    omega = sor.observed_relaxation(rate)
+
+        # Copying the solution out of shared memory
+        if processes > 1:
+            solution = solution.copy()
+    finally:
+        if processes > 1:
+            sweeper.close()
+
+    convergence_errors = abs(solution - old_solution)
+
+    return solution, convergence_errors
+
+
+def multigrid_solve(
+    initial_temps: np.ndarray,
+    op_mask: np.ndarray,
+    pow_mask: np.ndarray,
+    k_mask: np.ndarray,
+    convergence_region: dict,
+    step_size,
+    stopping_condition,
+    max_iterations,
+    boundary_func: Callable,
+    coarse_masks=(),
+    full=True,
+    pre_sweeps=2,
+    post_sweeps=2,
+    coarse_sweeps=200,
+) -> np.ndarray:
+    """
+    Solves the Poisson equation using geometric multigrid V-cycles with the same
+    operations and stopping condition as poisson_solve. Each V-cycle counts as one
+    iteration.
+
+    coarse_masks is a list of (op_mask, pow_mask, k_mask, step_size) of the system
+    at successively coarser step sizes, as returned by system.coarse_masks. With
+    full, the starting field is found by full multigrid (FMG): the problem is solved
+    on the coarsest grid and interpolated onto each finer grid, followed by a
+    V-cycle on each.
     """
     # Microprocessor index bounds
     xmin = convergence_region["xmin"]
@@ -35,29 +592,74 @@ def poisson_solve(
     ymin = convergence_region["ymin"]
     ymax = convergence_region["ymax"]
 
-    # Determining the mask of thermal conductivities to the left, right, bottom and top
-    # of their original points
-    k_btm = np.roll(k_mask, 1, axis=1)
-    k_top = np.roll(k_mask, -1, axis=1)
+    levels = [multigrid.Level(op_mask, pow_mask, k_mask, step_size)]
+    for masks in coarse_masks:
+        levels.append(multigrid.Level(*masks))
 
     # Setting the solution to the initial temperature distribution guess
     solution = initial_temps.copy()
 
+    # Full multigrid starting field
+    if full and len(levels) > 1:
+        temps = solution
+        for index in range(len(levels) - 1):
+            temps = multigrid.restrict_temps(levels[index], levels[index + 1], temps)
+
+        # Each V-cycle performs coarse_sweeps sweeps on the coarsest grid
+        coarsest = levels[-1]
+        whole_grid = {
+            "xmin": 0,
+            "xmax": coarsest.shape[0],
+            "ymin": 0,
+            "ymax": coarsest.shape[1],
+        }
+        temps, _ = sor_solve(
+            temps,
+            coarsest.op_mask,
+            coarsest.pow_mask,
+            coarsest.k_mask,
+            whole_grid,
+            coarsest.step_size,
+            stopping_condition,
+            max_iterations * coarse_sweeps,
+            boundary_func,
+            omega="adaptive",
+        )
+
+        for index in range(len(levels) - 2, -1, -1):
+            if index == 0:
+                finer = solution
+            else:
+                finer = np.full(levels[index].shape, np.mean(temps))
+            finer = multigrid.prolong_temps(
+                levels[index + 1], levels[index], temps, finer
+            )
+            temps = multigrid.v_cycle(
+                levels,
+                index,
+                finer,
+                boundary_func,
+                None,
+                pre_sweeps,
+                post_sweeps,
+                coarse_sweeps,
+            )
+
+    old_solution = np.empty_like(solution)
+
     # Track max iterations
     counter = 0
     while True:
-        old_solution = solution.copy()
-
-        # Calculating the next iteration
-        solution = jacobi.jacobi_poisson_iteration(
-            old_solution,
-            op_mask,
-            pow_mask,
-            k_mask,
-            k_btm,
-            k_top,
+        np.copyto(old_solution, solution)
+        multigrid.v_cycle(
+            levels,
+            0,
+            solution,
             boundary_func,
-            step_size,
+            None,
+            pre_sweeps,
+            post_sweeps,
+            coarse_sweeps,
         )
 
         counter += 1
@@ -72,6 +674,229 @@ def poisson_solve(
         if frac_change < stopping_condition:
             break
 
-        convergence_errors = abs(solution - old_solution)
+    convergence_errors = abs(solution - old_solution)
 
     return solution, convergence_errors
+
+
+def newton_solve(
+    initial_temps: np.ndarray,
+    op_mask: np.ndarray,
+    pow_mask: np.ndarray,
+    k_mask: np.ndarray,
+    convergence_region: dict,
+    step_size,
+    stopping_condition,
+    max_iterations,
+    boundary_func: Callable,
+    boundary_derivative: Callable = None,
+    linear_solver="direct",
+) -> np.ndarray:
+    """
+    Solves the discrete Poisson equation assembled as a sparse matrix, using Newton's
+    method for the nonlinear boundary heat flux. Each Newton step counts as one
+    iteration and the same stopping condition as poisson_solve is applied.
+
+    boundary_derivative defaults to the analytic derivative in
+    heat_equations.DERIVATIVES. linear_solver is either "direct" (sparse LU) or
+    "krylov" (GMRES preconditioned with an incomplete LU factorisation). Steps that
+    do not reduce the residual are halved.
+    """
+    # Microprocessor index bounds
+    xmin = convergence_region["xmin"]
+    xmax = convergence_region["xmax"]
+    ymin = convergence_region["ymin"]
+    ymax = convergence_region["ymax"]
+
+    if boundary_derivative is None:
+        if boundary_func not in he.DERIVATIVES:
+            raise RuntimeError("No derivative is known for the boundary function")
+        boundary_derivative = he.DERIVATIVES[boundary_func]
+
+    system = assembly.SparseSystem(
+        op_mask, pow_mask, k_mask, step_size, initial_temps
+    )
+    temps = system.gather(initial_temps)
+    residual = system.residual(temps, boundary_func)
+
+    # Setting the solution to the initial temperature distribution guess
+    solution = initial_temps.copy()
+    old_solution = solution
+
+    # Track max iterations
+    counter = 0
+    while True:
+        # Solving for the Newton step
+        jacobian = system.jacobian(temps, boundary_derivative).tocsc()
+        if linear_solver == "direct":
+            step = splinalg.spsolve(jacobian, -residual)
+        elif linear_solver == "krylov":
+            preconditioner = splinalg.spilu(jacobian)
+            step, _ = splinalg.gmres(
+                jacobian,
+                -residual,
+                M=splinalg.LinearOperator(jacobian.shape, preconditioner.solve),
+                atol=0.0,
+                **{GMRES_TOLERANCE: 1e-12},
+            )
+        else:
+            raise RuntimeError(f"Unknown linear solver: {linear_solver}")
+
+        # Halving the step until the residual decreases
+        norm = np.linalg.norm(residual)
+        for _ in range(MAX_STEP_HALVINGS):
+            with np.errstate(invalid="ignore"):
+                new_residual = system.residual(temps + step, boundary_func)
+            new_norm = np.linalg.norm(new_residual)
+            if np.isfinite(new_norm) and new_norm <= norm:
+                break
+            step *= 0.5
+        else:
+            print("Residual not reduced by any step: Newton iterations not converging")
+            if counter == 0:
+                old_solution = np.full(solution.shape, np.inf)
+            break
+        temps = temps + step
+        residual = new_residual
+        old_solution = solution
+        solution = system.scatter(temps, old_solution)
+
+        counter += 1
+        if counter > max_iterations:
+            print("Max iterations reached")
+            break
+
+        # Check for convergence of microprocessor temperatures
+        frac_change = fractional_change(
+            solution[xmin:xmax, ymin:ymax], old_solution[xmin:xmax, ymin:ymax]
+        )
+        if frac_change < stopping_condition:
+            break
+
+    convergence_errors = abs(solution - old_solution)
+
+    return solution, convergence_errors
+
+
+def direct_solve(
+    initial_temps: np.ndarray,
+    op_mask: np.ndarray,
+    pow_mask: np.ndarray,
+    k_mask: np.ndarray,
+    convergence_region: dict,
+    step_size,
+    stopping_condition,
+    max_iterations,
+    boundary_func: Callable,
+) -> np.ndarray:
+    """
+    Solves the discrete Poisson equation directly for a boundary heat flux that is
+    linear in temperature (forced convection), using the cached sparse LU
+    factorisation of the geometry. The stopping condition and max iterations are
+    not used and the convergence errors are zero.
+    """
+    # Determining the intercept and slope of the boundary heat flux
+    test_temps = np.array([20.0, 100.0, 1000.0])
+    with np.errstate(invalid="ignore"):
+        fluxes = boundary_func(test_temps)
+    slope = (fluxes[1] - fluxes[0]) / (test_temps[1] - test_temps[0])
+    intercept = fluxes[0] - slope * test_temps[0]
+    if not np.allclose(fluxes, intercept + slope * test_temps):
+        raise RuntimeError("The direct solver requires a linear boundary heat flux")
+
+    system, factorisation = assembly.linear_factorisation(
+        op_mask, pow_mask, k_mask, step_size, slope, initial_temps
+    )
+    rhs = system.power_rhs(pow_mask, initial_temps) - intercept * system.flux
+    solution = system.scatter(factorisation.solve(rhs), initial_temps)
+    convergence_errors = np.zeros(solution.shape)
+
+    return solution, convergence_errors
+
+
+def batch_poisson_solve(
+    initial_temps: np.ndarray,
+    op_masks: np.ndarray,
+    pow_masks: np.ndarray,
+    k_masks: np.ndarray,
+    convergence_regions: list[dict],
+    step_size,
+    stopping_condition,
+    max_iterations,
+    boundary_func: Callable,
+) -> np.ndarray:
+    """
+    Solves a batch of Poisson equations in lockstep with the Jacobi method. The
+    grids are stacked along the first axis of the (batch, nx, ny) arrays and are
+    advanced with a single jacobi_poisson_iteration per iteration. Each member
+    applies the stopping condition of poisson_solve to its own convergence region
+    and is removed from the stack once it has converged.
+    """
+    solutions = initial_temps.copy()
+    convergence_errors = np.zeros(solutions.shape)
+
+    # Members that have not converged and their stacked masks
+    active = np.arange(len(solutions))
+    ops = op_masks
+    pows = pow_masks
+    ks = k_masks
+    temps = solutions
+
+    # Track max iterations
+    counter = 0
+    while active.size:
+        # Determining the mask of thermal conductivities to the bottom and top of
+        # their original points
+        k_btm = np.roll(ks, 1, axis=-1)
+        k_top = np.roll(ks, -1, axis=-1)
+
+        while True:
+            new_temps = jacobi.jacobi_poisson_iteration(
+                temps, ops, pows, ks, k_btm, k_top, boundary_func, step_size
+            )
+
+            counter += 1
+            if counter > max_iterations:
+                print("Max iterations reached")
+                converged = np.ones(active.size, dtype=bool)
+                break
+
+            # Check for convergence of each microprocessor's temperatures
+            converged = np.zeros(active.size, dtype=bool)
+            for member, index in enumerate(active):
+                region = convergence_regions[index]
+                xmin, xmax = region["xmin"], region["xmax"]
+                ymin, ymax = region["ymin"], region["ymax"]
+                frac_change = fractional_change(
+                    new_temps[member, xmin:xmax, ymin:ymax],
+                    temps[member, xmin:xmax, ymin:ymax],
+                )
+                converged[member] = frac_change < stopping_condition
+            if np.any(converged):
+                break
+
+            temps = new_temps
+
+        # Retiring the converged members
+        finished = active[converged]
+        solutions[finished] = new_temps[converged]
+        convergence_errors[finished] = abs(new_temps[converged] - temps[converged])
+
+        remaining = ~converged
+        active = active[remaining]
+        ops = ops[remaining]
+        pows = pows[remaining]
+        ks = ks[remaining]
+        temps = new_temps[remaining]
+
+    return solutions, convergence_errors
+
+
+# Solver backends selectable from MicroprocessorSystem.solve_system
+SOLVERS = {
+    "jacobi": poisson_solve,
+    "sor": sor_solve,
+    "multigrid": multigrid_solve,
+    "newton": newton_solve,
+    "direct": direct_solve,
+}
@@ -0,0 +1,68 @@
+import numpy as np
+from typing import Callable
+from .jacobi import StencilPlan
+
+
+def grid_relaxation(shape: tuple) -> float:
+    """
+    Estimates the optimal over-relaxation factor from the dimensions of the grid.
+    The spectral radius of the Jacobi iteration is taken from a rectangle of twice
+    the size of the grid since the insulated (Neumann) edges reflect the slowest
+    modes.
+    """
+    width, height = shape
+    jacobi_radius = 0.5 * (np.cos(np.pi / (2 * width)) + np.cos(np.pi / (2 * height)))
+    return 2 / (1 + np.sqrt(1 - jacobi_radius**2))
+
+
+def observed_relaxation(rate) -> float:
+    """
+    Estimates the optimal over-relaxation factor from the observed contraction rate
+    of Gauss-Seidel sweeps, whose spectral radius is the square of that of the
+    Jacobi iteration.
+    """
+    rate = min(rate, 1 - 1e-12)
+    return 2 / (1 + np.sqrt(1 - rate))
+
+
+class RedBlackSweep:
+    def __init__(
+        self,
+        op_mask: np.ndarray,
+        pow_mask: np.ndarray,
+        k_centre: np.ndarray,
+        k_btm: np.ndarray,
+        k_top: np.ndarray,
+        step_size,
+    ):
+        """
+        Splits the operations into red and black points of a checkerboard. Every
+        operation only couples a point to points of the other colour, so each colour
+        can be updated in place at once.
+        """
+        i, j = np.indices(op_mask.shape)
+        red = (i + j) % 2 == 0
+        self.plans = (
+            StencilPlan(
+                np.where(red, op_mask, 0), pow_mask, k_centre, k_btm, k_top, step_size
+            ),
+            StencilPlan(
+                np.where(red, 0, op_mask), pow_mask, k_centre, k_btm, k_top, step_size
+            ),
+        )
+
+    def sweep(
+        self,
+        temps: np.ndarray,
+        boundary: Callable,
+        omega,
+        forcing: np.ndarray = None,
+    ) -> np.ndarray:
+        """
+        Performs one successive over-relaxation sweep of temps in place, red points
+        first and then black points.
+        """
+        for plan in self.plans:
+            plan.iterate(temps, boundary, out=temps, relaxation=omega, forcing=forcing)
+
+        return temps
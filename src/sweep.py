@@ -0,0 +1,142 @@
+"""Runs parameter sweeps of heat sink systems over a pool of processes."""
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from .system import MicroprocessorSystem, solve_mean_temp
+from . import errors
+
+
+def parameter_grid(**values) -> list[dict]:
+    """
+    Expands lists of values of the heat sink dimensions (base_width, fin_height,
+    fin_width, fin_spacing) into every combination. Single values are held fixed.
+    """
+    names = list(values)
+    options = [
+        value if isinstance(value, (list, tuple)) else [value]
+        for value in values.values()
+    ]
+
+    return [
+        dict(zip(names, combination)) for combination in itertools.product(*options)
+    ]
+
+
+def solve_sink(
+    sink_dimensions: dict,
+    step_size,
+    initial_temp,
+    stopping_condition,
+    max_iterations,
+    forced,
+    method,
+    solver_options: dict,
+):
+    """
+    Solves a heat sink system (scenario 3) and returns the mean temperature of the
+    microprocessor with its convergence uncertainty.
+    """
+    return solve_mean_temp(
+        MicroprocessorSystem(3, **sink_dimensions),
+        initial_temp,
+        step_size,
+        stopping_condition,
+        max_iterations,
+        forced=forced,
+        method=method,
+        **solver_options,
+    )
+
+
+def run_sweep(
+    grid: list[dict],
+    step_size,
+    levels=3,
+    initial_temp="auto",
+    stopping_condition=1e-7,
+    max_iterations=1000000,
+    forced=False,
+    max_workers=None,
+    method="newton",
+    **solver_options,
+) -> list[dict]:
+    """
+    Solves every heat sink of the grid at step_size, step_size / 2, ... (levels step
+    sizes) concurrently on a ProcessPoolExecutor with max_workers processes (the
+    number of CPUs by default). Returns one row per system with its dimensions and
+    the Richardson study of its mean temperatures (see errors.richardson):
+    - temps:                mean temperatures at each step size
+    - mean_temp:            extrapolation of the last two with the observed order
+    - order:                observed order of convergence (nan if second order is
+                            assumed)
+    - discretisation_error: estimated discretisation error of mean_temp
+    The systems are solved with Newton's method by default, which converges from the
+    "auto" initial temperature. Further keyword arguments (e.g. method="jacobi" with
+    stopping="residual") are passed on to solve_system.
+    """
+    if levels < 2:
+        raise RuntimeError("A Richardson study requires at least two levels")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for sink_dimensions in grid:
+            for level in range(levels):
+                futures.append(
+                    executor.submit(
+                        solve_sink,
+                        sink_dimensions,
+                        step_size / 2**level,
+                        initial_temp,
+                        stopping_condition,
+                        max_iterations,
+                        forced,
+                        method,
+                        solver_options,
+                    )
+                )
+        temps = [future.result() for future in futures]
+
+    rows = []
+    for index, sink_dimensions in enumerate(grid):
+        row = dict(sink_dimensions)
+        row["temps"] = temps[levels * index : levels * (index + 1)]
+        mean_temp, order, discretisation_error = errors.richardson(row["temps"])
+        row["mean_temp"] = mean_temp
+        row["order"] = order
+        row["discretisation_error"] = discretisation_error
+        rows.append(row)
+
+    return rows
+
+
+def format_table(rows: list[dict]) -> str:
+    """
+    Formats the rows returned by run_sweep as a table of the swept dimensions (in
+    mm), the extrapolated mean temperatures with their convergence uncertainties,
+    the observed orders of convergence ("2 (assumed)" where they could not be
+    observed) and the discretisation errors. The columns are as wide as their
+    widest cell.
+    """
+    results = ("temps", "mean_temp", "order", "discretisation_error")
+    names = [name for name in rows[0] if name not in results]
+    header = [f"{name} (mm)" for name in names]
+    header += ["Mean temp (C)", "Order", "Disc. error (C)"]
+
+    table = [header]
+    for row in rows:
+        cells = [f"{row[name] * 1e3:.3g}" for name in names]
+        cells.append(format(row["mean_temp"], ".2u"))
+        if np.isnan(row["order"]):
+            cells.append("2 (assumed)")
+        else:
+            cells.append(f"{row['order']:.2f}")
+        cells.append(f"{row['discretisation_error']:.2f}")
+        table.append(cells)
+    widths = [
+        max(len(cells[column]) for cells in table) for column in range(len(header))
+    ]
+
+    return "\n".join(
+        "  ".join(f"{cell:>{width}}" for cell, width in zip(cells, widths))
+        for cells in table
+    )
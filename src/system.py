@@ -1,10 +1,28 @@
 """Contains classes that correspond to the different objects and their properties."""
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+import hashlib
+import os
+import time
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from . import poisson_solver as ps
 from . import heat_equations as he
 from . import errors
+from . import energy
+
+# Number of sets of masks kept in memory by generate_masks
+MASK_CACHE_SIZE = 32
+_masks = OrderedDict()
+
+# Directory of the compressed mask files, or None to only cache them in memory
+MASK_CACHE_DIR = None
+
+# Loosest stopping condition of the coarse solve of warm_start="auto". The coarse
+# field only needs to be as accurate as its (first order) discretisation difference
+# from the field at the step size.
+WARM_START_STOPPING = 1e-2
 
 
 # Functions
@@ -51,17 +69,78 @@ def all_object_bnds(objects, step_size: float) -> list[dict]:
     return all_bounds
 
 
-def create_mesh(objects, step_size):
-    """Generates a mesh of zeros that overlays the complete system of objects."""
+def min_feature_size(objects) -> float:
+    """
+    Determines the smallest width, height or horizontal gap between two objects at
+    the same height (e.g. the spacing of the fins) in the system.
+    """
+    sizes = []
+    for obj in objects:
+        sizes.append(obj.xmax - obj.xmin)
+        sizes.append(obj.ymax - obj.ymin)
+
+    for obj in objects:
+        for other in objects:
+            overlapping = obj.ymin < other.ymax and other.ymin < obj.ymax
+            if overlapping and other.xmin > obj.xmax:
+                sizes.append(other.xmin - obj.xmax)
+
+    return min(sizes)
+
+
+def coarse_masks(objects, step_size, n_levels=None) -> list[tuple]:
+    """
+    Generates the masks of the system at 2, 4, 8... times the step size for the
+    multigrid solver, as a list of (operation_mask, power_mask, conductivity_mask,
+    step_size). Unless n_levels is given, the grid is coarsened for as long as the
+    coarse step size does not exceed the smallest feature of the system, so that
+    fins and gaps are not merged.
+    """
+    if n_levels is None:
+        smallest = min_feature_size(objects) * (1 + 1e-9)
+        n_levels = 0
+        while step_size * 2 ** (n_levels + 1) <= smallest:
+            n_levels += 1
+
+    levels = []
+    for level in range(1, n_levels + 1):
+        coarse_step = step_size * 2**level
+        levels.append(generate_masks(objects, coarse_step) + (coarse_step,))
+
+    return levels
+
+
+def create_mesh(objects, step_size, path=None):
+    """
+    Generates a mesh of zeros that overlays the complete system of objects. If path
+    is given, the mesh is an np.memmap of an .npy file at that path.
+    """
 
     xmin, xmax, ymin, ymax = determine_extremes(objects)
     x_values = np.arange(xmin, xmax + step_size, step_size)
     y_values = np.arange(ymin, ymax + step_size, step_size)
     width = x_values.size
     height = y_values.size
+    if path is not None:
+        if os.path.exists(path):
+            os.remove(path)
+        return np.lib.format.open_memmap(path, mode="w+", shape=(width, height))
     return np.zeros((width, height))
 
 
+def row_blocks(shape, block_rows=None) -> list:
+    """
+    Slices of the blocks of block_rows rows (by default about ps.MEMMAP_BLOCK_POINTS
+    points) that cover a grid of that shape.
+    """
+    if block_rows is None:
+        block_rows = max(1, ps.MEMMAP_BLOCK_POINTS // shape[1])
+
+    return [
+        np.s_[start : start + block_rows] for start in range(0, shape[0], block_rows)
+    ]
+
+
 def add_operation_numbers(binary_mesh: np.ndarray) -> np.ndarray:
     """
     Converts a binary mesh representing the shape of the system to a mesh that
@@ -81,80 +160,121 @@ def add_operation_numbers(binary_mesh: np.ndarray) -> np.ndarray:
     10: Material interface
     """
     operation_mesh = binary_mesh.copy()
-    width = len(operation_mesh)
-    height = len(operation_mesh[0])
-
-    for i in range(len(operation_mesh)):
-        for j in range(len(operation_mesh[0])):
-            # Material interfaces
-            if operation_mesh[i][j] == 2:
-                operation_mesh[i][j] = 10
-
-            if operation_mesh[i][j] == 1:
-                # Boundary checks
-                is_left = i == 0
-                is_right = i == width - 1
-                is_bottom = j == 0
-                is_top = j == height - 1
-
-                if i != 0:
-                    is_left = operation_mesh[i - 1][j] == 0
-                if i != width - 1:
-                    is_right = operation_mesh[i + 1][j] == 0
-                if j != 0:
-                    is_bottom = operation_mesh[i][j - 1] == 0
-                if j != height - 1:
-                    is_top = operation_mesh[i][j + 1] == 0
-
-                # Bottom-left corner
-                if is_bottom and is_left:
-                    operation_mesh[i][j] = 6
-
-                # Bottom-right corner
-                elif is_bottom and is_right:
-                    operation_mesh[i][j] = 7
-
-                # Top-left corner
-                elif is_top and is_left:
-                    operation_mesh[i][j] = 8
-
-                # Top-right corner
-                elif is_top and is_right:
-                    operation_mesh[i][j] = 9
-
-                # Left boundary
-                elif is_left:
-                    operation_mesh[i][j] = 2
-
-                # Right boundary
-                elif is_right:
-                    operation_mesh[i][j] = 3
-
-                # Bottom boundary
-                elif is_bottom:
-                    operation_mesh[i][j] = 4
-
-                # Top boundary
-                elif is_top:
-                    operation_mesh[i][j] = 5
+
+    # Whether the neighbour to the left, right, bottom and top of each point is air
+    # (or outside the mesh)
+    empty = np.pad(binary_mesh == 0, 1, constant_values=True)
+    is_left = empty[:-2, 1:-1]
+    is_right = empty[2:, 1:-1]
+    is_bottom = empty[1:-1, :-2]
+    is_top = empty[1:-1, 2:]
+
+    # Assigned from the lowest to the highest priority so that corners take
+    # precedence over edges
+    operations = np.ones(binary_mesh.shape)
+    operations[is_top] = 5
+    operations[is_bottom] = 4
+    operations[is_right] = 3
+    operations[is_left] = 2
+    operations[is_top & is_right] = 9
+    operations[is_top & is_left] = 8
+    operations[is_bottom & is_right] = 7
+    operations[is_bottom & is_left] = 6
+
+    points = binary_mesh == 1
+    operation_mesh[points] = operations[points]
+
+    # Material interfaces
+    operation_mesh[binary_mesh == 2] = 10
 
     return operation_mesh
 
 
-def generate_masks(objects, step_size):
+def geometry_key(objects, step_size) -> str:
+    """
+    Canonical hash of the bounds, conductivities and power outputs of the objects
+    and the step size.
+    """
+    key = hashlib.sha1()
+    for obj in objects:
+        properties = (obj.xmin, obj.xmax, obj.ymin, obj.ymax, obj.k, obj.power)
+        key.update(repr(tuple(float(value) for value in properties)).encode())
+    key.update(repr(float(step_size)).encode())
+
+    return key.hexdigest()
+
+
+def generate_masks(objects, step_size, directory=None, block_rows=None):
     """
     Generates these masks which will be utilised in the Poisson heat equation solver:
     - operation_mask:    Type of operation from 0 to 9 for each coordinate.
     - power_mask:        Power output for each coordinate.
     - conduvtivity_mask: Conductivity for each coordinate.
+
+    The masks of the last MASK_CACHE_SIZE geometries are cached by geometry_key and
+    are read-only. If MASK_CACHE_DIR is set, they are also stored there as
+    compressed .npz files which are reused by later sessions.
+
+    If directory is given, the masks are memory-mapped .npy files built in it in
+    blocks of block_rows rows (see build_masks), and are not cached.
+    """
+    if directory is not None:
+        return build_masks(objects, step_size, directory, block_rows)
+
+    key = geometry_key(objects, step_size)
+    if key in _masks:
+        _masks.move_to_end(key)
+        return _masks[key]
+
+    path = None
+    if MASK_CACHE_DIR is not None:
+        path = os.path.join(MASK_CACHE_DIR, f"{key}.npz")
+    if path is not None and os.path.exists(path):
+        with np.load(path) as stored:
+            masks = (stored["op_mask"], stored["pow_mask"], stored["k_mask"])
+    else:
+        masks = build_masks(objects, step_size)
+        if path is not None:
+            # Writing to a temporary file first so that other processes never read a
+            # partially written file
+            os.makedirs(MASK_CACHE_DIR, exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as file:
+                np.savez_compressed(
+                    file, op_mask=masks[0], pow_mask=masks[1], k_mask=masks[2]
+                )
+            os.replace(temporary, path)
+
+    for mask in masks:
+        mask.setflags(write=False)
+    _masks[key] = masks
+    if len(_masks) > MASK_CACHE_SIZE:
+        _masks.popitem(last=False)
+
+    return masks
+
+
+def build_masks(objects, step_size, directory=None, block_rows=None):
+    """
+    Builds the masks returned by generate_masks. If directory is given, they are
+    np.memmap arrays of op_mask.npy, pow_mask.npy and k_mask.npy in it, and the
+    operation numbers are assigned in blocks of block_rows rows (see row_blocks) so
+    that the temporaries are the size of a block.
     """
+
+    def mesh(name):
+        if directory is None:
+            return create_mesh(objects, step_size)
+        return create_mesh(objects, step_size, os.path.join(directory, f"{name}.npy"))
+
     # Initialising meshes
-    base = create_mesh(objects, step_size)
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
     # Mask of the combined system where interfaces will be set to 2 and remaining points
     # to 1
-    materials_mask = base.copy()
-    power_mask = base.copy()
-    conductivity_mask = base.copy()
+    materials_mask = mesh("materials_mask")
+    power_mask = mesh("pow_mask")
+    conductivity_mask = mesh("k_mask")
 
     # Determining bounds
     bounds = all_object_bnds(objects, step_size)
@@ -174,11 +294,237 @@ def generate_masks(objects, step_size):
         power_mask[xmin : xmax + 1, ymin : ymax + 1] = objects[i].power
         conductivity_mask[xmin : xmax + 1, ymin : ymax + 1] = objects[i].k
 
-    operation_mask = add_operation_numbers(materials_mask)
+    if directory is None:
+        operation_mask = add_operation_numbers(materials_mask)
+        return operation_mask, power_mask, conductivity_mask
+
+    # The operations of a block depend on the rows either side of it
+    operation_mask = mesh("op_mask")
+    for rows in row_blocks(operation_mask.shape, block_rows):
+        block = operation_mask[rows]
+        first = max(rows.start - 1, 0)
+        operations = add_operation_numbers(materials_mask[first : rows.stop + 1])
+        block[:] = operations[rows.start - first :][: len(block)]
+    del materials_mask
+    os.remove(os.path.join(directory, "materials_mask.npy"))
 
     return operation_mask, power_mask, conductivity_mask
 
 
+def interpolate_temps(objects, coarse_temps, coarse_step, step_size) -> np.ndarray:
+    """
+    Bilinearly interpolates a temperature field solved at coarse_step onto the mesh
+    of step_size, for use as a starting field. Only the solid points of the coarse
+    grid are used (the weights are renormalised over them) so that air temperatures
+    do not leak into the objects. Points without a solid coarse neighbour are given
+    the mean solid coarse temperature.
+    """
+    fine_shape = create_mesh(objects, step_size).shape
+    coarse_solid = generate_masks(objects, coarse_step)[0] != 0
+    values = np.where(coarse_solid, coarse_temps, 0.0)
+    weights = coarse_solid.astype(float)
+
+    # Fractional coarse indices of the fine points along each axis
+    ratio = step_size / coarse_step
+    for axis in (0, 1):
+        length = values.shape[axis]
+        position = np.arange(fine_shape[axis]) * ratio
+        lower = np.clip(np.floor(position).astype(int), 0, length - 1)
+        upper = np.clip(lower + 1, 0, length - 1)
+        fraction = np.clip(position - lower, 0, 1)
+
+        shape = [1, 1]
+        shape[axis] = -1
+        fraction = fraction.reshape(shape)
+        values = (1 - fraction) * np.take(values, lower, axis) + fraction * np.take(
+            values, upper, axis
+        )
+        weights = (1 - fraction) * np.take(weights, lower, axis) + fraction * np.take(
+            weights, upper, axis
+        )
+
+    temps = np.full(fine_shape, np.mean(coarse_temps[coarse_solid]))
+    np.divide(values, weights, out=temps, where=weights > 0)
+
+    return temps
+
+
+def heat_generated(op_mask: np.ndarray, pow_mask: np.ndarray, step_size) -> float:
+    """
+    Total heat generated by the points of the masks in the discrete equations, power
+    times cell area (energy.cell_areas), in W per unit depth. Summed block by block
+    (see row_blocks).
+    """
+    generated = 0
+    for rows in row_blocks(op_mask.shape):
+        areas = energy.cell_areas(op_mask[rows], step_size)
+        generated += np.sum(pow_mask[rows] * areas)
+
+    return generated
+
+
+def energy_balance_temp(objects, step_size, boundary, masks=None) -> float:
+    """
+    Estimates the steady-state surface temperature of the system from a lumped
+    energy balance, for use as a uniform initial guess. The heat generated (power
+    times rasterised area, per unit depth) must leave through the boundary points
+    (operations 2 to 9), each of which exposes one step size of surface. The
+    boundary heat flux is then inverted with heat_equations.INVERSES.
+
+    The areas are those implied by the discrete equations (energy.CELL_AREAS): each
+    point covers h^2, halved on edges and quartered on corners, and material
+    interfaces (operation 10) generate no heat.
+
+    masks are the masks of the objects at step_size if they are already generated
+    (e.g. memory-mapped ones), which are summed block by block.
+    """
+    if boundary not in he.INVERSES:
+        raise RuntimeError("No inverse is known for the boundary function")
+
+    if masks is None:
+        masks = generate_masks(objects, step_size)
+    op_mask, pow_mask, _ = masks
+    generated = heat_generated(op_mask, pow_mask, step_size)
+    perimeter = 0
+    for rows in row_blocks(op_mask.shape):
+        perimeter += np.sum(energy.exposed_lengths(op_mask[rows], step_size))
+
+    return he.INVERSES[boundary](generated / perimeter)
+
+
+# Operations of the reflection of a point in a vertical line
+REFLECTED_OPERATIONS = {2: 3, 3: 2, 6: 7, 7: 6, 8: 9, 9: 8}
+
+# Operations of the points on the symmetry line of a half domain
+MIRROR_OPERATIONS = {0: 0, 1: 11, 4: 12, 5: 13, 10: 10}
+
+
+def mirror_masks(op_mask: np.ndarray, pow_mask: np.ndarray, k_mask: np.ndarray):
+    """
+    Checks whether the masks are symmetric under reflection in the vertical line
+    through the middle column of the grid. If so, returns the masks of the left half
+    of the domain up to and including the middle column, whose points are given the
+    operations 11 to 13 (zero heat flux across the symmetry line). Returns None if
+    the masks are not symmetric or there is no middle column.
+    """
+    width = op_mask.shape[0]
+    if width % 2 == 0:
+        return None
+
+    reflected = op_mask[::-1].copy()
+    for op, reflection in REFLECTED_OPERATIONS.items():
+        reflected[op_mask[::-1] == op] = reflection
+    symmetric = (
+        np.array_equal(reflected, op_mask)
+        and np.array_equal(pow_mask[::-1], pow_mask)
+        and np.array_equal(k_mask[::-1], k_mask)
+    )
+    if not symmetric:
+        return None
+
+    middle = width // 2
+    half_op_mask = op_mask[: middle + 1].copy()
+    centre_ops = half_op_mask[middle].copy()
+    for op, mirrored in MIRROR_OPERATIONS.items():
+        half_op_mask[middle][centre_ops == op] = mirrored
+
+    return half_op_mask, pow_mask[: middle + 1].copy(), k_mask[: middle + 1].copy()
+
+
+def unfold(half_grid: np.ndarray) -> np.ndarray:
+    """
+    Reconstructs the full grid from the left half returned by mirror_masks.
+    """
+    return np.concatenate((half_grid, half_grid[-2::-1]), axis=0)
+
+
+def solve_systems(
+    systems: list,
+    initial_temps,
+    step_size,
+    stopping_condition,
+    max_iterations,
+    forced=False,
+):
+    """
+    Solves several MicroprocessorSystems at the same step size in lockstep with
+    poisson_solver.batch_poisson_solve, setting the temps and mean_temp of each
+    system as solve_system does. The masks are padded with air to a common grid
+    shape. initial_temps is either one initial temperature for all the systems or
+    a list with one per system, and "auto" is estimated with energy_balance_temp.
+    The batch solver only has the change stopping condition, which a close initial
+    guess such as "auto" can satisfy long before convergence (see solve_system).
+    """
+    # Choosing either forced or natural convection
+    if forced:
+        boundary = he.forced_dissipation
+    else:
+        boundary = he.natural_dissipation
+
+    if np.isscalar(initial_temps):
+        initial_temps = [initial_temps] * len(systems)
+
+    # Generating the masks of each system
+    all_masks = [generate_masks(system.objects, step_size) for system in systems]
+    shapes = [masks[0].shape for masks in all_masks]
+    batch_shape = (len(systems),) + tuple(np.max(shapes, axis=0))
+
+    # Padding and stacking the masks and initial guesses
+    op_masks = np.zeros(batch_shape)
+    pow_masks = np.zeros(batch_shape)
+    k_masks = np.zeros(batch_shape)
+    initial_guesses = np.zeros(batch_shape)
+    processor_bounds = []
+    for index, (system, masks) in enumerate(zip(systems, all_masks)):
+        width, height = shapes[index]
+        op_masks[index, :width, :height] = masks[0]
+        pow_masks[index, :width, :height] = masks[1]
+        k_masks[index, :width, :height] = masks[2]
+
+        initial_temp = initial_temps[index]
+        if initial_temp == "auto":
+            initial_temp = energy_balance_temp(system.objects, step_size, boundary)
+        initial_guesses[index] = initial_temp
+        processor_bounds.append(all_object_bnds(system.objects, step_size)[0])
+
+    temperatures, convergence_errors = ps.batch_poisson_solve(
+        initial_guesses,
+        op_masks,
+        pow_masks,
+        k_masks,
+        processor_bounds,
+        step_size,
+        stopping_condition,
+        max_iterations,
+        boundary,
+    )
+
+    for index, system in enumerate(systems):
+        width, height = shapes[index]
+        system.temps = temperatures[index, :width, :height]
+        system.step_size = step_size
+
+        # Mean temperature with convergence error
+        xmin = processor_bounds[index]["xmin"]
+        xmax = processor_bounds[index]["xmax"]
+        ymin = processor_bounds[index]["ymin"]
+        ymax = processor_bounds[index]["ymax"]
+        system.mean_temp = errors.mean_value(
+            system.temps[xmin:xmax, ymin:ymax],
+            convergence_errors[index, xmin:xmax, ymin:ymax],
+        )
+
+
+def solve_mean_temp(system, initial_temp, step_size, *args, **kwargs):
+    """
+    Solves the system and returns the mean temperature of the microprocessor. Used
+    to solve copies of a system in other processes.
+    """
+    system.solve_system(initial_temp, step_size, *args, **kwargs)
+
+    return system.mean_temp
+
+
 # Classes
 class Object:
     def __init__(
@@ -221,6 +567,8 @@ class MicroprocessorSystem:
         """
         self.temps = []
         self.mean_temp = None
+        self.step_size = None
+        self.time_limited = False
 
         if scenario > 3:
             raise RuntimeError("There are only 4 physical scenarios")
@@ -285,38 +633,220 @@ class MicroprocessorSystem:
         )
 
     def solve_system(
-        self, initial_temp, step_size, stopping_condition, max_iterations, forced=False
+        self,
+        initial_temp,
+        step_size,
+        stopping_condition,
+        max_iterations,
+        forced=False,
+        method="jacobi",
+        warm_start=None,
+        mirror=False,
+        time_budget=None,
+        checkpoint_dir=None,
+        **solver_options,
     ):
         """
         Solves the Poisson heat equation of the microprocessor system via the Jacobi
-        method.
+        method, or another backend from poisson_solver.SOLVERS chosen by method:
+        - jacobi:    poisson_solve
+        - sor:       sor_solve (red-black successive over-relaxation)
+        - multigrid: multigrid_solve (geometric multigrid V-cycles)
+        - newton:    newton_solve (sparse matrix with Newton's method)
+        - direct:    direct_solve (cached sparse LU factorisation, forced only)
+        Any further keyword arguments (e.g. kernel, pingpong or omega) are passed on
+        to the solver. The heat_generated of the energy balance of poisson_solve
+        defaults to that of the (possibly mirrored) masks (heat_generated).
+
+        An initial_temp of "auto" is estimated from the energy balance of the system
+        (energy_balance_temp). Such a close start, like a warm start, fools the
+        default change stopping condition of poisson_solve, whose consecutive
+        iterations then differ too little long before convergence, so the Jacobi
+        solver defaults to stopping="residual" with relaxation=0.95 in both cases
+        (except with Anderson acceleration, which does not support it).
+
+        warm_start replaces the uniform initial_temp with an interpolated coarse
+        solution (nested iteration):
+        - (temps, coarse_step): a field previously solved at coarse_step, e.g.
+          (system.temps, system.step_size).
+        - "auto": the system is first solved at twice the step size from
+          initial_temp with the same settings, but a stopping_condition no tighter
+          than WARM_START_STOPPING.
+        The interpolated field is shifted uniformly so that its boundary points
+        dissipate the heat generated at step_size (energy.EnergyBalance), since the
+        level of the solution changes with the rasterised geometry.
+
+        With mirror, systems whose masks are symmetric about the middle column (see
+        mirror_masks) are solved on the left half of the domain with a zero heat flux
+        across the symmetry line, and the full field is reconstructed. Asymmetric
+        systems are solved on the full domain. A time_budget is not supported for
+        mirrored solves.
+
+        time_budget is a wall-clock limit in seconds for the whole solve (Jacobi
+        only). If it runs out, temps holds the current field and mean_temp is the
+        asymptotic mean temperature of the microprocessor extrapolated from the
+        iteration history (errors.asymptotic_value), with the uncertainty of the
+        extrapolation, which is infinite with fewer than three entries of the history
+        (every check_interval iterations). The coarse solve of warm_start="auto" is
+        given half of the budget. time_limited records whether the budget ran out.
+
+        If checkpoint_dir is set, poisson_solve writes checkpoints of the solve to a
+        file in it named after the geometry_key, the convection and whether the domain
+        is mirrored (Jacobi only). With resume=True, a solve continues from the
+        checkpoint of the same geometry, step size and convection if there is one.
+
+        If memmap_dir is given (Jacobi with the fused kernel and pingpong), the masks
+        (see build_masks), the initial guess and the fields of poisson_solve are
+        memory-mapped .npy files in it and temps is a memmap of temps.npy, unless the
+        domain is mirrored. The coarse solve of warm_start="auto" uses the coarse
+        subdirectory.
         """
+        start = time.perf_counter()
+        self.time_limited = False
+
         # Microprocessor index bounds
         all_bounds = all_object_bnds(self.objects, step_size)
         processor_bounds = all_bounds[0]
 
-        # Generating masks and initial guesses
-        op_mask, pow_mask, k_mask = generate_masks(self.objects, step_size)
-        initial_guess = create_mesh(self.objects, step_size)
-        initial_guess[:, :] = initial_temp
-
         # Choosing either forced or natural convection
         if forced:
             boundary = he.forced_dissipation
         else:
             boundary = he.natural_dissipation
-        temperatures, convergence_errors = ps.poisson_solve(
+
+        # Stopping condition of close initial guesses
+        close_start = initial_temp == "auto" or warm_start is not None
+        anderson = solver_options.get("anderson_depth", 0)
+        if close_start and method == "jacobi" and not anderson:
+            if "stopping" not in solver_options:
+                solver_options["stopping"] = "residual"
+                solver_options.setdefault("relaxation", 0.95)
+
+        # Generating masks and initial guesses, memory-mapped for out-of-core solves
+        memmap_dir = solver_options.get("memmap_dir")
+        op_mask, pow_mask, k_mask = generate_masks(
+            self.objects, step_size, memmap_dir, solver_options.get("block_rows")
+        )
+        half_masks = None
+        if mirror:
+            half_masks = mirror_masks(op_mask, pow_mask, k_mask)
+        if half_masks is not None and time_budget is not None:
+            raise RuntimeError(
+                "A time budget is not combined with a mirrored domain, whose history "
+                "of means only covers half of the microprocessor"
+            )
+        if warm_start is None:
+            if initial_temp == "auto":
+                initial_temp = energy_balance_temp(
+                    self.objects, step_size, boundary, (op_mask, pow_mask, k_mask)
+                )
+            path = None
+            if memmap_dir is not None:
+                path = os.path.join(memmap_dir, "initial_temps.npy")
+            initial_guess = create_mesh(self.objects, step_size, path)
+            initial_guess[:, :] = initial_temp
+        else:
+            if isinstance(warm_start, str):
+                if warm_start != "auto":
+                    raise RuntimeError(f"Unknown warm start: {warm_start}")
+                # Coarse masks given for the multigrid solver only fit step_size
+                coarse_options = dict(solver_options)
+                coarse_options.pop("coarse_masks", None)
+                coarse_options.pop("mean_history", None)
+                coarse_options.pop("energy_history", None)
+                if memmap_dir is not None:
+                    coarse_options["memmap_dir"] = os.path.join(memmap_dir, "coarse")
+                if time_budget is not None:
+                    coarse_options["time_budget"] = time_budget / 2
+                self.solve_system(
+                    initial_temp,
+                    2 * step_size,
+                    max(stopping_condition, WARM_START_STOPPING),
+                    max_iterations,
+                    forced=forced,
+                    method=method,
+                    **coarse_options,
+                )
+                warm_start = (self.temps, self.step_size)
+            coarse_temps, coarse_step = warm_start
+            initial_guess = interpolate_temps(
+                self.objects, coarse_temps, coarse_step, step_size
+            )
+            # The rasterised geometry, and with it the level of the solution, changes
+            # with the step size, so the field is shifted to balance the heat
+            # generated at step_size
+            generated = heat_generated(op_mask, pow_mask, step_size)
+            balance = energy.EnergyBalance(op_mask, step_size, generated)
+            initial_guess += balance.balancing_shift(
+                initial_guess, boundary, he.DERIVATIVES[boundary]
+            )
+
+        if method not in ps.SOLVERS:
+            raise RuntimeError(f"Unknown solver method: {method}")
+        if method == "multigrid" and "coarse_masks" not in solver_options:
+            solver_options["coarse_masks"] = coarse_masks(self.objects, step_size)
+
+        # Reducing symmetric systems to the left half of the domain
+        convergence_region = processor_bounds
+        if half_masks is not None and method == "multigrid":
+            half_levels = []
+            for *masks, coarse_step in solver_options["coarse_masks"]:
+                half_levels.append(mirror_masks(*masks))
+                if half_levels[-1] is None:
+                    half_masks = None
+                    break
+                half_levels[-1] += (coarse_step,)
+            if half_masks is not None:
+                solver_options = dict(solver_options, coarse_masks=half_levels)
+        if half_masks is not None:
+            op_mask, pow_mask, k_mask = half_masks
+            initial_guess = initial_guess[: op_mask.shape[0]]
+            convergence_region = dict(processor_bounds)
+            convergence_region["xmax"] = min(
+                processor_bounds["xmax"], op_mask.shape[0]
+            )
+
+        # Heat generated for the energy balance of poisson_solve
+        energy_balance = solver_options.get("stopping") == "energy"
+        energy_balance |= "energy_history" in solver_options
+        if energy_balance and "heat_generated" not in solver_options:
+            solver_options["heat_generated"] = heat_generated(
+                op_mask, pow_mask, step_size
+            )
+
+        # Checkpoint of this geometry, step size and convection
+        if checkpoint_dir is not None:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            key = f"{geometry_key(self.objects, step_size)}-{boundary.__name__}"
+            if half_masks is not None:
+                key += "-mirror"
+            solver_options["checkpoint"] = os.path.join(checkpoint_dir, f"{key}.npz")
+            solver_options["checkpoint_key"] = key
+
+        # Remaining time and the history for the extrapolated mean temperature
+        if time_budget is not None:
+            solver_options["time_budget"] = time_budget - (time.perf_counter() - start)
+            mean_history = solver_options.setdefault("mean_history", [])
+
+        temperatures, convergence_errors = ps.SOLVERS[method](
             initial_guess,
             op_mask,
             pow_mask,
             k_mask,
-            processor_bounds,
+            convergence_region,
             step_size,
             stopping_condition,
             max_iterations,
             boundary,
+            **solver_options,
         )
+        if time_budget is not None:
+            self.time_limited = time.perf_counter() - start >= time_budget
+        if half_masks is not None:
+            temperatures = unfold(temperatures)
+            convergence_errors = unfold(convergence_errors)
         self.temps = temperatures
+        self.step_size = step_size
 
         # Determining mean temperature of microprocessor with uncertainty
         xmin = processor_bounds["xmin"]
@@ -329,6 +859,67 @@ class MicroprocessorSystem:
             temperatures[xmin:xmax, ymin:ymax], convergence_errors[xmin:xmax, ymin:ymax]
         )
 
+        # Extrapolated mean temperature if the time budget ran out, with an infinite
+        # uncertainty if there are too few iterates to extrapolate
+        if self.time_limited:
+            history = [mean for _, mean in mean_history] or [self.mean_temp.n]
+            self.mean_temp = errors.asymptotic_value(history)
+
+    def converged_mean_temp(
+        self,
+        step_size,
+        levels=3,
+        initial_temp="auto",
+        stopping_condition=1e-7,
+        max_iterations=1000000,
+        forced=False,
+        max_workers=None,
+        method="newton",
+        **solver_options,
+    ) -> tuple:
+        """
+        Richardson study of the mean microprocessor temperature. The system is solved
+        at step_size, step_size / 2, ... (levels step sizes) concurrently on a
+        ProcessPoolExecutor, with Newton's method by default, which converges from
+        the "auto" initial temperature.
+
+        With the iterative methods (jacobi, sor and multigrid), every finer solve is
+        warm started from its own solve at twice its step size (warm_start="auto")
+        so that the expensive fine solves overlap rather than waiting for each
+        other. The coarse solves are therefore duplicated: step_size / 2**k is
+        solved once for each finer level as well as for its own. Further keyword
+        arguments are passed on to solve_system. Returns:
+        - the extrapolated mean temperature
+        - the observed order of convergence of the last three step sizes (nan for
+          two levels or non-monotone convergence, in which case second order is
+          assumed)
+        - an estimate of the discretisation error of the extrapolated value
+        """
+        if levels < 2:
+            raise RuntimeError("A Richardson study requires at least two levels")
+        iterative = method in ("jacobi", "sor", "multigrid")
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = []
+            for level in range(levels):
+                futures.append(
+                    executor.submit(
+                        solve_mean_temp,
+                        self,
+                        initial_temp,
+                        step_size / 2**level,
+                        stopping_condition,
+                        max_iterations,
+                        forced=forced,
+                        method=method,
+                        warm_start="auto" if level and iterative else None,
+                        **solver_options,
+                    )
+                )
+            temps = [future.result() for future in futures]
+
+        return errors.richardson(temps)
+
     def output_temps(self):
         """
         Returns the temperature grid of the microprocessor system once it has
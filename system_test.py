@@ -35,3 +35,17 @@ import pstats
 
 p = pstats.Stats("profile_out")
 p.sort_stats("cumulative").print_stats(30)
+
+# %% Kernel equivalence on fins one point wide, whose side neighbours are air
+narrow_sys = sys.MicroprocessorSystem(
+    3, base_width=19e-3, fin_height=10e-3, fin_width=1e-3, fin_spacing=2e-3
+)
+kernel_temps = {}
+for kernel in ("plan", "fused", "compact"):
+    narrow_sys.solve_system(300, 1e-3, 0, 3000, forced=True, kernel=kernel)
+    kernel_temps[kernel] = narrow_sys.temps
+    print(kernel, narrow_sys.mean_temp)
+for kernel in ("fused", "compact"):
+    difference = np.abs(kernel_temps[kernel] - kernel_temps["plan"]).max()
+    print(f"Largest difference of {kernel} from plan: {difference:.2e}")
+    assert difference < 1e-9